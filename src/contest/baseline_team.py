@@ -20,7 +20,6 @@
 # John DeNero (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
-import random
 import contest.util as util
 
 from contest.capture_agents import CaptureAgent
@@ -63,6 +62,9 @@ class ReflexCaptureAgent(CaptureAgent):
     def __init__(self, index, time_for_computing=.1):
         super().__init__(index, time_for_computing)
         self.start = None
+        # The successors of the last state passed to get_successor, by action
+        self.successors_of = None
+        self.successors = {}
 
     def register_initial_state(self, game_state):
         self.start = game_state.get_agent_position(self.index)
@@ -76,7 +78,7 @@ class ReflexCaptureAgent(CaptureAgent):
 
         # You can profile your evaluation time by uncommenting these lines
         # start = time.time()
-        values = [self.evaluate(game_state, a) for a in actions]
+        values = self.evaluate_actions(game_state, actions)
         # print 'eval time for agent %d: %.4f' % (self.index, time.time() - start)
 
         max_value = max(values)
@@ -96,13 +98,18 @@ class ReflexCaptureAgent(CaptureAgent):
                     best_dist = dist
             return best_action
 
-        return random.choice(best_actions)
+        return self.rng.choice(best_actions)
 
     def get_successor(self, game_state, action):
         """
         Finds the next successor which is a grid position (location tuple).
         """
-        successor = game_state.generate_successor(self.index, action)
+        if game_state is not self.successors_of:
+            self.successors_of = game_state
+            self.successors = dict(game_state.generate_successors(self.index))
+        successor = self.successors.get(action)
+        if successor is None:
+            successor = game_state.generate_successor(self.index, action)
         pos = successor.get_agent_state(self.index).get_position()
         if pos != nearest_point(pos):
             # Only half a grid position was covered
@@ -118,6 +125,24 @@ class ReflexCaptureAgent(CaptureAgent):
         weights = self.get_weights(game_state, action)
         return features * weights
 
+    def evaluate_actions(self, game_state, actions):
+        """
+        Evaluates all the actions. Features given as vectors of one
+        contest.features.FeatureSchema, e.g. by agents with many features,
+        are evaluated together by FeatureSchema.evaluate; other features
+        (the util.Counter of the baseline) and subclasses that override
+        evaluate go through evaluate one action at a time.
+        """
+        if type(self).evaluate is not ReflexCaptureAgent.evaluate:
+            return [self.evaluate(game_state, a) for a in actions]
+        features = [self.get_features(game_state, a) for a in actions]
+        weights = [self.get_weights(game_state, a) for a in actions]
+        schema = getattr(features[0], 'schema', None) if features else None
+        if schema is None or not all(getattr(f, 'schema', None) is schema for f in features):
+            # The same product as evaluate, with the features already computed
+            return [f * w for f, w in zip(features, weights)]
+        return schema.evaluate(features, weights)
+
     def get_features(self, game_state, action):
         """
         Returns a counter of features for the state
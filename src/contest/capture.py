@@ -48,17 +48,14 @@ Capture.py holds the logic for Pacman capture the flag.
     P1: 'a', 's', 'd', and 'w' to move
     P2: 'l', ';', ',' and 'p' to move
 """
-import importlib.util
-import importlib.machinery
 import os
-import pathlib
 import random
 import sys
 import time
-import traceback
 
-import contest.keyboard_agents as keyboard_agents
+import contest.layout
 from contest.game import Actions
+from contest.events import EventLog, EventPrinter, JsonlWriter
 from contest.game import GameStateData, Game, Grid, Configuration
 from contest.util import nearest_point, manhattan_distance
 
@@ -79,9 +76,74 @@ DUMP_FOOD_ON_DEATH = True  # if we have the gameplay element that dumps dots on
 
 SCARED_TIME = 40
 
+# Team ids used to index the per-team tables of GameStateData
+RED_TEAM = 0
+BLUE_TEAM = 1
 
-def compute_noisy_distance(pos1, pos2):
-    return int(manhattan_distance(pos1, pos2) + random.choice(SONAR_NOISE_VALUES))
+
+def compute_noisy_distance(pos1, pos2, rng=None):
+    """The sonar reading of the distance, noise drawn from rng (a random.Random, default the random module)"""
+    return int(manhattan_distance(pos1, pos2) + (rng or random).choice(SONAR_NOISE_VALUES))
+
+
+class SightModel:
+    """
+    Decides which cells an agent sees from where it stands. Observations hide
+    the enemies that no teammate can see.
+
+    For every layout, the cells visible from each open cell are precomputed
+    once as a bitmask (bit x * height + y, as in Layout.get_wall_bitmask), so
+    checking whether a team sees an enemy is a single bit test. Subclasses
+    only define can_see and the radius beyond which nothing is ever visible.
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+
+    def can_see(self, layout, from_pos, to_pos):
+        raise NotImplementedError
+
+    def get_masks(self, layout):
+        """Returns a dict mapping every open (x, y) to the bitmask of the cells visible from it."""
+        return contest.layout.REGISTRY.get_derived(layout, (type(self).__name__, self.radius), self.compute_masks)
+
+    def compute_masks(self, layout):
+        walls, height, r = layout.walls, layout.height, self.radius
+        masks = {}
+        for x, y in walls.as_list(False):
+            mask = 0
+            for to_x in range(max(0, x - r), min(layout.width, x + r + 1)):
+                for to_y in range(max(0, y - r), min(height, y + r + 1)):
+                    if not walls[to_x][to_y] and self.can_see(layout, (x, y), (to_x, to_y)):
+                        mask |= 1 << (to_x * height + to_y)
+            masks[(x, y)] = mask
+        return masks
+
+
+class RadiusSight(SightModel):
+    """Sees every cell within a Manhattan distance of radius, walls included."""
+
+    def can_see(self, layout, from_pos, to_pos):
+        return manhattan_distance(from_pos, to_pos) <= self.radius
+
+
+class LineOfSight(SightModel):
+    """Sees the cells within a Manhattan distance of radius that are not hidden behind a wall."""
+
+    def can_see(self, layout, from_pos, to_pos):
+        if manhattan_distance(from_pos, to_pos) > self.radius:
+            return False
+        (x0, y0), (x1, y1) = from_pos, to_pos
+        steps = max(abs(x1 - x0), abs(y1 - y0))
+        for step in range(1, steps):
+            x = int(x0 + (x1 - x0) * step / steps + 0.5)
+            y = int(y0 + (y1 - y0) * step / steps + 0.5)
+            if layout.walls[x][y]:
+                return False
+        return True
+
+
+DEFAULT_SIGHT_MODEL = RadiusSight(SIGHT_RANGE)
 
 
 ###################################################
@@ -113,9 +175,40 @@ class GameState:
         """Returns the successor state (a GameState object) after the specified agent takes the action."""
         # Copy current state
         state = GameState(self)
+        return self._apply_action(state, agent_index, action)
+
+    def generate_successors(self, agent_index):
+        """
+        Returns a list of (action, successor) pairs, one for every legal action
+        of the specified agent.
+
+        The legal actions are computed once and the successors share the agent
+        states that the action cannot change with this state: all but the
+        agent's own, unless it moves onto a capsule or next to another agent.
+        Copy an agent state (AgentState.copy) before editing it in place.
+        """
+        legal = self.get_legal_actions(agent_index)
+        agent_states = self.data.agent_states
+        pos = agent_states[agent_index].get_position()
+        others = [other.get_position() for other in agent_states if other is not agent_states[agent_index]]
+
+        successors = []
+        for action in legal:
+            next_pos = Actions.get_successor(pos, action)
+            isolated = nearest_point(next_pos) not in self.data.capsules and \
+                all(other is None or manhattan_distance(other, next_pos) > 1 for other in others)
+            if isolated:
+                state = GameState(self, copy_agent_states=False)
+                state.data.agent_states[agent_index] = agent_states[agent_index].copy()
+            else:
+                state = GameState(self)
+            successors.append((action, self._apply_action(state, agent_index, action, legal)))
+        return successors
 
+    def _apply_action(self, state, agent_index, action, legal=None):
+        """Applies the action to state, a copy of this state, and returns it."""
         # Find appropriate rules for the agent
-        AgentRules.apply_action(state, action, agent_index)
+        AgentRules.apply_action(state, action, agent_index, legal)
         AgentRules.check_death(state, agent_index)
         AgentRules.decrement_timer(state.data.agent_states[agent_index])
 
@@ -226,19 +319,24 @@ class GameState:
     # You shouldn't need to call these directly #
     #############################################
 
-    def __init__(self, prev_state=None):
+    def __init__(self, prev_state=None, copy_agent_states=True):
         """Generates a new state by copying information from its predecessor."""
         if prev_state is not None:  # Initial state
-            self.data = GameStateData(prev_state.data)
+            self.data = GameStateData(prev_state.data, copy_agent_states)
             self.blue_team = prev_state.blue_team
             self.red_team = prev_state.red_team
             self.data.timeleft = prev_state.data.timeleft
 
             self.teams = prev_state.teams
             self.agent_distances = prev_state.agent_distances
+            self.sight_model = prev_state.sight_model
+            self.rng = prev_state.rng
         else:
             self.data = GameStateData()
             self.agent_distances = []
+            self.sight_model = DEFAULT_SIGHT_MODEL
+            # Sonar noise of the game (see CaptureRules.new_game); None uses the random module
+            self.rng = None
 
     def deep_copy(self):
         state = GameState(self)
@@ -257,8 +355,10 @@ class GameState:
         # Adds the sonar signal
         pos = state.get_agent_position(index)
         n = state.get_num_agents()
-        distances = [compute_noisy_distance(pos, state.get_agent_position(i)) for i in range(n)]
+        distances = [compute_noisy_distance(pos, state.get_agent_position(i), self.rng) for i in range(n)]
         state.agent_distances = distances
+        # The agents do not get the sonar stream of the game, whose draws would change the next readings
+        state.rng = None
 
         # Remove states of distant opponents
         if index in self.blue_team:
@@ -268,13 +368,18 @@ class GameState:
             other_team = self.blue_team
             team = self.red_team
 
+        # Cells seen by the team, as a bitmask of x * height + y
+        masks = self.sight_model.get_masks(state.data.layout)
+        seen = 0
+        for teammate in team:
+            seen |= masks.get(state.get_agent_position(teammate), 0)
+
+        height = state.data.layout.height
         for enemy in other_team:
-            seen = False
             enemy_pos = state.get_agent_position(enemy)
-            for teammate in team:
-                if manhattan_distance(enemy_pos, state.get_agent_position(teammate)) <= SIGHT_RANGE:
-                    seen = True
-            if not seen: state.data.agent_states[enemy].configuration = None
+            if enemy_pos is None: continue
+            if not seen >> (enemy_pos[0] * height + enemy_pos[1]) & 1:
+                state.data.agent_states[enemy].configuration = None
         return state
 
     def __eq__(self, other):
@@ -296,6 +401,7 @@ class GameState:
         self.blue_team = [i for i, p in enumerate(positions) if not self.is_red(p)]
         self.red_team = [i for i, p in enumerate(positions) if self.is_red(p)]
         self.teams = [self.is_red(p) for p in positions]
+        self.data.agent_teams = tuple(RED_TEAM if is_red else BLUE_TEAM for is_red in self.teams)
         # This is usually 60 (always 60 with random maps)
         # However, if layout map is specified otherwise, it could be less
         global TOTAL_FOOD
@@ -350,19 +456,43 @@ class CaptureRules:
   and how the game starts and ends.
   """
 
-    def __init__(self, quiet=False):
+    def __init__(self, quiet=False, sight_model=None, events=None):
         self._init_blue_food = None
         self._init_red_food = None
         self.quiet = quiet
+        self.sight_model = sight_model or DEFAULT_SIGHT_MODEL
+        # Shared by the games of these rules; prints the usual messages unless given
+        self.events = events if events is not None else EventLog([EventPrinter(self)])
 
-    def new_game(self, layout, agents, display, length, mute_agents, catch_exceptions):
+    def new_game(self, layout, agents, display, length, mute_agents, catch_exceptions, seed=None, warm_up=True):
+        """
+        Sets up a game. Its randomness (the starting team, the sonar noise and
+        the rng of every agent) comes from separate random.Random streams
+        derived from seed, by default drawn from the random module, so that
+        the games of a seed are the same whatever runs next to them.
+        warm_up=False skips preparing the layout data of the agents, for
+        games whose agents do not think, like replays.
+        """
+        if warm_up:
+            # The layout data the agents need (maze distances...) is computed here, before their clocks start
+            contest.layout.REGISTRY.warm_up([layout])
+            self.sight_model.get_masks(layout)
+        if seed is None:
+            seed = random.getrandbits(64)
         init_state = GameState()
+        init_state.sight_model = self.sight_model
+        init_state.rng = random.Random(f'{seed}/sonar')
         init_state.initialize(layout, len(agents))
-        starter = random.randint(0, 1)
-        print('%s team starts' % ['Red', 'Blue'][starter])
+        for index, agent in enumerate(agents):
+            if agent is not None:
+                agent.rng = random.Random(f'{seed}/agent{index}')
+        starter = random.Random(f'{seed}/starter').randint(0, 1)
+        self.events.emit('game_start', layout=layout.layout_name, num_agents=len(agents), length=length,
+                         starter=starter)
         game = Game(agents, display, self, starting_index=starter, mute_agents=mute_agents,
-                    catch_exceptions=catch_exceptions)
+                    catch_exceptions=catch_exceptions, events=self.events)
         game.state = init_state
+        game.seed = seed
         game.length = length
         game.state.data.timeleft = length
         if 'drawCenterLine' in dir(display):
@@ -374,35 +504,54 @@ class CaptureRules:
     @staticmethod
     def process(state, game):
         """Checks to see whether it is time to end the game."""
-        if 'move_history' in dir(game):
+        if hasattr(game, 'move_history'):
             if len(game.move_history) == game.length:
                 state.data._win = True
 
         if state.is_over():
             game.game_over = True
-            if not game.rules.quiet:
-                red_count = 0
-                blue_count = 0
-                food_to_win = (TOTAL_FOOD / 2) - MIN_FOOD
-                for index in range(state.get_num_agents()):
-                    agent_state = state.data.agent_states[index]
-                    if index in state.get_red_team_indices():
-                        red_count += agent_state.num_returned
-                    else:
-                        blue_count += agent_state.num_returned
-
-                if blue_count >= food_to_win:  # state.getRedFood().count() == MIN_FOOD:
-                    print(f'The Blue team has returned at least {food_to_win} of the opponents\' dots.')
-                elif red_count >= food_to_win:  # state.getBlueFood().count() == MIN_FOOD:
-                    print(f'The Red team has returned at least {food_to_win} of the opponents\' dots.')
-                else:  # if state.getBlueFood().count() > MIN_FOOD and state.getRedFood().count() > MIN_FOOD:
-                    print('Time is up.')
-                    if state.data.score == 0:
-                        print('Tie game!')
-                    else:
-                        winner = 'Red'
-                        if state.data.score < 0: winner = 'Blue'
-                        print(f'The {winner} team wins by {abs(state.data.score)} points.')
+            red_count = state.data.team_returned[RED_TEAM]
+            blue_count = state.data.team_returned[BLUE_TEAM]
+            food_to_win = (TOTAL_FOOD / 2) - MIN_FOOD
+
+            reason, team = 'time', None
+            if blue_count >= food_to_win:  # state.getRedFood().count() == MIN_FOOD:
+                reason, team = 'food', 'Blue'
+            elif red_count >= food_to_win:  # state.getBlueFood().count() == MIN_FOOD:
+                reason, team = 'food', 'Red'
+            score = state.data.score
+            winner = 'Red' if score > 0 else 'Blue' if score < 0 else None
+            game.events.emit('end', reason=reason, team=team, score=score, winner=winner, food_to_win=food_to_win)
+
+    def emit_move_events(self, game, previous_state, agent_index, action):
+        """Emits the food eaten and returned and the deaths of a move (see events.py)."""
+        events = game.events
+        if not (events.wants('eat') or events.wants('return') or events.wants('death')):
+            return
+        data = game.state.data
+        if data._food_eaten is not None:
+            events.emit('eat', agent=agent_index, position=tuple(map(int, data._food_eaten)), kind='food')
+        if data._capsule_eaten is not None:
+            events.emit('eat', agent=agent_index, position=tuple(map(int, data._capsule_eaten)), kind='capsule')
+
+        for index, (before, after) in enumerate(zip(previous_state.data.agent_states, data.agent_states)):
+            if after.num_returned > before.num_returned:
+                events.emit('return', agent=index, count=after.num_returned - before.num_returned, score=data.score)
+            # Agents are eaten by sending them back to their start configuration
+            if after.configuration is after.start and before.configuration is not before.start:
+                if index == agent_index:
+                    position = Actions.get_successor(before.get_position(), action)
+                    opponents = (game.state.get_blue_team_indices() if game.state.is_on_red_team(index)
+                                 else game.state.get_red_team_indices())
+                    killers = [other for other in opponents
+                               if data.agent_states[other].get_position() is not None and
+                               manhattan_distance(data.agent_states[other].get_position(), position)
+                               <= COLLISION_TOLERANCE]
+                    killer = killers[0] if killers else None
+                else:
+                    position, killer = before.get_position(), agent_index
+                events.emit('death', agent=index, position=tuple(map(int, position)), killer=killer,
+                            dropped=before.num_carrying)
 
     def get_progress(self, game):
         blue = 1.0 - (game.state.get_blue_food().count() / float(self._init_blue_food))
@@ -415,11 +564,13 @@ class CaptureRules:
     @staticmethod
     def agent_crash(game, agent_index):
         if agent_index % 2 == 0:
-            print("Red agent crashed", file=sys.stderr)
             game.state.data.score = -1
+            team, winner = 'Red', 'Blue'
         else:
-            print("Blue agent crashed", file=sys.stderr)
             game.state.data.score = 1
+            team, winner = 'Blue', 'Red'
+        game.events.emit('end', reason='crash', team=team, score=game.state.data.score, winner=winner,
+                         food_to_win=(TOTAL_FOOD / 2) - MIN_FOOD)
 
     @staticmethod
     def get_max_total_time():
@@ -442,6 +593,45 @@ class CaptureRules:
         return 2  # Third violation loses the game
 
 
+# Visiting order of the food dumping BFS, as offsets from the death position.
+# The search expands through walls and off the board, so the order does not
+# depend on the layout and is shared by every dump. It is grown ring by ring:
+# _DUMP_RINGS[d] is the index in _DUMP_ORDER where Chebyshev ring d starts.
+_DUMP_ORDER = [(0, 0)]
+_DUMP_RINGS = [0, 1]
+
+
+def dump_order(max_radius):
+    """
+    Yields the offsets visited by the food dumping BFS (8-neighbourhood, FIFO)
+    in order, up to Chebyshev distance max_radius from the start.
+    """
+    radius = 0
+    while radius <= max_radius:
+        if radius == len(_DUMP_RINGS) - 1:
+            _extend_dump_order()
+        for i in range(_DUMP_RINGS[radius], _DUMP_RINGS[radius + 1]):
+            yield _DUMP_ORDER[i]
+        radius += 1
+
+
+def _extend_dump_order():
+    """Appends the next ring, discovered in the same order a BFS would."""
+    radius = len(_DUMP_RINGS) - 1
+    ring = []
+    seen = set()
+    for i in range(_DUMP_RINGS[radius - 1], _DUMP_RINGS[radius]):
+        x, y = _DUMP_ORDER[i]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                successor = (x + dx, y + dy)
+                if max(abs(successor[0]), abs(successor[1])) == radius and successor not in seen:
+                    seen.add(successor)
+                    ring.append(successor)
+    _DUMP_ORDER.extend(ring)
+    _DUMP_RINGS.append(len(_DUMP_ORDER))
+
+
 class AgentRules:
     """
     These functions govern how each agent interacts with her environment.
@@ -454,7 +644,12 @@ class AgentRules:
         """
         agent_state = state.get_agent_state(agent_index)
         conf = agent_state.configuration
-        possible_actions = Actions.get_possible_actions(conf, state.data.layout.walls)
+        # Agents on a grid point use the precomputed table of the layout
+        possible_actions = state.data.layout.get_legal_actions_table().get(conf.pos)
+        if possible_actions is None:
+            possible_actions = Actions.get_possible_actions(conf, state.data.layout.walls)
+        else:
+            possible_actions = list(possible_actions)
         return AgentRules.filter_for_allowed_actions(possible_actions)
 
     @staticmethod
@@ -462,9 +657,13 @@ class AgentRules:
         return possible_actions
 
     @staticmethod
-    def apply_action(state, action, agent_index):
-        """Edits the state to reflect the results of the action."""
-        legal = AgentRules.get_legal_actions(state, agent_index)
+    def apply_action(state, action, agent_index, legal=None):
+        """
+        Edits the state to reflect the results of the action. legal, if given,
+        are the legal actions of the agent, already computed.
+        """
+        if legal is None:
+            legal = AgentRules.get_legal_actions(state, agent_index)
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
@@ -490,18 +689,13 @@ class AgentRules:
                 score = agent_state.num_carrying if is_red else -1 * agent_state.num_carrying
                 state.data.score_change += score
 
+                team = state.data.agent_teams[agent_index]
+                state.data.team_carrying[team] -= agent_state.num_carrying
+                state.data.team_returned[team] += agent_state.num_carrying
                 agent_state.num_returned += agent_state.num_carrying
                 agent_state.num_carrying = 0
 
-                red_count = 0
-                blue_count = 0
-                for index in range(state.get_num_agents()):
-                    agent = state.data.agent_states[index]
-                    if index in state.get_red_team_indices():
-                        red_count += agent.num_returned
-                    else:
-                        blue_count += agent.num_returned
-                if red_count >= (TOTAL_FOOD / 2) - MIN_FOOD or blue_count >= (TOTAL_FOOD / 2) - MIN_FOOD:
+                if max(state.data.team_returned) >= (TOTAL_FOOD / 2) - MIN_FOOD:
                     state.data._win = True
 
         if agent_state.is_pacman and manhattan_distance(nearest, current_position) <= 0.9:
@@ -514,18 +708,19 @@ class AgentRules:
         if state.data.food[x][y]:
 
             # blue case is the default
-            team_indices_func = state.get_blue_team_indices
+            team, team_indices = BLUE_TEAM, state.blue_team
             # score = -1
             if is_red:
                 # switch if its red
                 # score = 1
-                team_indices_func = state.get_red_team_indices
+                team, team_indices = RED_TEAM, state.red_team
 
             # go increase the variable for the pacman who ate this
-            agents = [state.data.agent_states[agentIndex] for agentIndex in team_indices_func()]
-            for agent in agents:
+            for agent_index in team_indices:
+                agent = state.data.agent_states[agent_index]
                 if agent.get_position() == position:
                     agent.num_carrying += 1
+                    state.data.team_carrying[team] += 1
                     break  # the above should only be true for one agent...
 
             # do all the score and food grid maintenance
@@ -547,10 +742,7 @@ class AgentRules:
             state.data._capsule_eaten = position
 
             # Reset all ghosts' scared timers
-            if is_red:
-                other_team = state.get_blue_team_indices()
-            else:
-                other_team = state.get_red_team_indices()
+            other_team = state.blue_team if is_red else state.red_team
             for index in other_team:
                 state.data.agent_states[index].scared_timer = SCARED_TIME
 
@@ -562,7 +754,7 @@ class AgentRules:
         state.scared_timer = max(0, timer - 1)
 
     @staticmethod
-    def dump_food_from_death(state, agent_state):
+    def dump_food_from_death(state, agent_state, agent_index):
         if not DUMP_FOOD_ON_DEATH:
             # this feature is not turned on
             return
@@ -587,9 +779,16 @@ class AgentRules:
 
         # state.data.scoreChange += scoreDirection * agent_state.numCarrying
 
-        def on_right_side(from_state, from_x, from_y):
-            new_dummy_config = Configuration((from_x, from_y), 'North')
-            return from_state.is_red(new_dummy_config) == is_red
+        width, height = state.data.layout.width, state.data.layout.height
+        halfway = width // 2
+
+        def on_right_side(from_x):
+            return (from_x < halfway) == is_red
+
+        # nobody moves while the food is dumped, so these lookups are built once
+        walls = state.data.layout.walls
+        capsules = set(state.data.capsules)
+        agent_poses = {state.get_agent_position(i) for i in range(state.get_num_agents())}
 
         # we have food to dump
         # -- expand out in BFS. Check:
@@ -598,10 +797,7 @@ class AgentRules:
         #   - that no other agents are there
         #   - that no power pellets are there
         #   - that it's on the right side of the grid
-        def all_good(from_state, from_x, from_y):
-            width, height = from_state.data.layout.width, from_state.data.layout.height
-            food, walls = from_state.data.food, from_state.data.layout.walls
-
+        def all_good(from_x, from_y):
             # bounds check
             if from_x >= width or from_y >= height or from_x <= 0 or from_y <= 0:
                 return False
@@ -612,14 +808,12 @@ class AgentRules:
                 return False
 
             # dots need to be on the side where this agent will be a pacman :P
-            if not on_right_side(from_state, from_x, from_y):
+            if not on_right_side(from_x):
                 return False
 
-            if (from_x, from_y) in from_state.data.capsules:
+            if (from_x, from_y) in capsules:
                 return False
 
-            # loop through agents
-            agent_poses = [from_state.get_agent_position(i) for i in range(from_state.get_num_agents())]
             if (from_x, from_y) in agent_poses:
                 return False
 
@@ -627,41 +821,29 @@ class AgentRules:
 
         num_to_dump = agent_state.num_carrying
         state.data.food = state.data.food.copy()
+        food = state.data.food
         food_added = []
 
-        def gen_successors(from_x, from_y):
-            dirs_x = [-1, 0, 1]
-            dirs_y = [-1, 0, 1]
-            return [(from_x + dx, from_y + dy) for dx in dirs_x for dy in dirs_y]
-
-        # BFS graph search
-        position_queue = [agent_state.get_position()]
-        seen = set()
-        while num_to_dump > 0:
-            if not len(position_queue):
-                raise Exception('Exhausted BFS! uh oh')
-            # pop one off, graph check
-            popped = position_queue.pop(0)
-            if popped in seen:
-                continue
-            seen.add(popped)
-
-            x, y = popped[0], popped[1]
-            x = int(x)
-            y = int(y)
-            if all_good(state, x, y):
-                state.data.food[x][y] = True
+        # BFS graph search, replayed from the precomputed visiting order
+        start_x, start_y = agent_state.get_position()
+        start_x, start_y = int(start_x), int(start_y)
+        for dx, dy in dump_order(max(width, height)):
+            x, y = start_x + dx, start_y + dy
+            if all_good(x, y):
+                food[x][y] = True
                 food_added.append((x, y))
                 num_to_dump -= 1
-
-            # generate successors
-            position_queue = position_queue + gen_successors(x, y)
+                if num_to_dump == 0:
+                    break
+        else:
+            raise Exception('Exhausted BFS! uh oh')
 
         if state.data._food_added is None:
             state.data._food_added = food_added
         else:
             state.data._food_added.extend(food_added)
         # now our agent_state is no longer carrying food
+        state.data.team_carrying[state.data.agent_teams[agent_index]] -= agent_state.num_carrying
         agent_state.num_carrying = 0
         pass
 
@@ -669,9 +851,9 @@ class AgentRules:
     def check_death(state, agent_index):
         agent_state = state.data.agent_states[agent_index]
         if state.is_on_red_team(agent_index):
-            other_team = state.get_blue_team_indices()
+            other_team = state.blue_team
         else:
-            other_team = state.get_red_team_indices()
+            other_team = state.red_team
         if agent_state.is_pacman:
             for index in other_team:
                 other_agent_state = state.data.agent_states[index]
@@ -681,7 +863,7 @@ class AgentRules:
                 if manhattan_distance(ghost_position, agent_state.get_position()) <= COLLISION_TOLERANCE:
                     # award points to the other team for killing Pacmen
                     if other_agent_state.scared_timer <= 0:
-                        AgentRules.dump_food_from_death(state, agent_state)
+                        AgentRules.dump_food_from_death(state, agent_state, agent_index)
 
                         score = KILL_POINTS
                         if state.is_on_red_team(agent_index):
@@ -707,7 +889,7 @@ class AgentRules:
                 if manhattan_distance(pac_pos, agent_state.get_position()) <= COLLISION_TOLERANCE:
                     # award points to the other team for killing Pacmen
                     if agent_state.scared_timer <= 0:
-                        AgentRules.dump_food_from_death(state, other_agent_state)
+                        AgentRules.dump_food_from_death(state, other_agent_state, index)
 
                         score = KILL_POINTS
                         if not state.is_on_red_team(agent_index):
@@ -789,6 +971,8 @@ def read_command(argv):
     parser.add_option('-t', '--textgraphics', action='store_true', dest='textgraphics',
                       help='Display output as text only', default=False)
 
+    parser.add_option('--text-fps', type='float', dest='text_fps', default=10,
+                      help=default('Frames per second of the text display, drawn in place on terminals'))
     parser.add_option('-q', '--quiet', action='store_true',
                       help='Display minimal output and no graphics', default=False)
 
@@ -797,6 +981,9 @@ def read_command(argv):
 
     parser.add_option('-z', '--zoom', type='float', dest='zoom',
                       help=default('Zoom in the graphics'), default=1)
+    parser.add_option('--render-fps', type='float', dest='render_fps', default=0,
+                      help=default('Draw the graphics on their own thread at this many frames per second, dropping '
+                                   'frames instead of slowing the game down; 0 draws every move in the game loop'))
     parser.add_option('-i', '--time', type='int', dest='time',
                       help=default('TIME limit of a game in moves'), default=1200, metavar='TIME')
     parser.add_option('-n', '--num_games', type='int', dest="num_games", help=default('Number of games to play'),
@@ -809,7 +996,13 @@ def read_command(argv):
                       help='Writes game histories to a file (named by the time they were played)', default=False)
 
     parser.add_option('--record-log', dest="record_log", action='store_true',
-                      help='Writes game log  to a file (named by the time they were played)', default=False)
+                      help='Writes the output of the match, agents included, to www/contest_<name>/logs/match_<id>.log',
+                      default=False)
+    parser.add_option('--record-events', dest="record_events", action='store_true',
+                      help='Writes the events of the games (moves, eaten food, deaths, timeouts, crashes...) '
+                           'to www/contest_<name>/logs/match_<id>.jsonl', default=False)
+    parser.add_option('--compress-events', dest="compress_events", action='store_true',
+                      help='Gzips the file written by --record-events', default=False)
     parser.add_option('--replay', default=None,
                       help='Replays a recorded game file.')
     parser.add_option('--replayq', default=None,
@@ -835,7 +1028,10 @@ def read_command(argv):
     #    args['display'] = pygameDisplay.PacmanGraphics()
     if parsed_options.textgraphics:
         import contest.text_display as text_display
-        args['display'] = text_display.PacmanGraphics()
+        if sys.stdout.isatty():
+            args['display'] = text_display.AnsiGraphics(parsed_options.text_fps)
+        else:
+            args['display'] = text_display.PacmanGraphics()
     elif parsed_options.quiet or parsed_options.replayq:
         import contest.text_display as text_display
         args['display'] = text_display.NullGraphics()
@@ -847,10 +1043,20 @@ def read_command(argv):
         import contest.capture_graphics_display as capture_graphics_display
         # Hack for agents writing to the display
         capture_graphics_display.FRAME_TIME = 0
-        args['display'] = capture_graphics_display.PacmanGraphics(parsed_options.red, parsed_options.red_name,
-                                                                  parsed_options.blue,
-                                                                  parsed_options.blue_name, parsed_options.zoom, 0,
-                                                                  capture=True)
+        keyboard = parsed_options.keys0 or parsed_options.keys1 or parsed_options.keys2 or parsed_options.keys3
+        if parsed_options.render_fps > 0 and not keyboard:
+            # Keyboard agents read the keys from the Tk window in the game loop, so they need the plain display
+            args['display'] = capture_graphics_display.ThreadedPacmanGraphics(parsed_options.red,
+                                                                              parsed_options.red_name,
+                                                                              parsed_options.blue,
+                                                                              parsed_options.blue_name,
+                                                                              parsed_options.zoom, 0, capture=True,
+                                                                              fps=parsed_options.render_fps)
+        else:
+            args['display'] = capture_graphics_display.PacmanGraphics(parsed_options.red, parsed_options.red_name,
+                                                                      parsed_options.blue,
+                                                                      parsed_options.blue_name, parsed_options.zoom,
+                                                                      0, capture=True)
         import __main__
         __main__.__dict__['_display'] = args['display']
 
@@ -919,6 +1125,8 @@ def read_command(argv):
     for index, val in enumerate(
             [parsed_options.keys0, parsed_options.keys1, parsed_options.keys2, parsed_options.keys3]):
         if not val: continue
+        # Imported only here, so that headless games never load the keyboard (and Tk) code
+        import contest.keyboard_agents as keyboard_agents
         if num_keyboard_agents == 0:
             agent = keyboard_agents.KeyboardAgent(index)
         elif num_keyboard_agents == 1:
@@ -934,11 +1142,11 @@ def read_command(argv):
     for i in range(parsed_options.num_games):
         if parsed_options.layout == 'RANDOM':
             layout_name, layout_text = random_layout()
-            layout_generated = layout.Layout(layout_name=layout_name, layout_text=layout_text.split('\n'))
+            layout_generated = layout.REGISTRY.intern(layout_name, layout_text.split('\n'))
         elif parsed_options.layout.startswith('RANDOM'):
             seed_chosen = int(parsed_options.layout[6:])
             layout_name, layout_text = random_layout(seed=seed_chosen)
-            layout_generated = layout.Layout(layout_name=layout_name, layout_text=layout_text.split('\n'))
+            layout_generated = layout.REGISTRY.intern(layout_name, layout_text.split('\n'))
         elif parsed_options.layout.lower().find('capture') == -1:
             raise Exception('You must use a capture layout with capture.py')
         else:
@@ -956,6 +1164,11 @@ def read_command(argv):
     args['delay_step'] = parsed_options.delay_step
     args['match_id'] = parsed_options.match_id
     args['contest_name'] = parsed_options.contest_name
+    if parsed_options.record_events:
+        sub_folder = f'www/contest_{parsed_options.contest_name}/logs'
+        os.makedirs(name=sub_folder, exist_ok=True)
+        extension = '.jsonl.gz' if parsed_options.compress_events else '.jsonl'
+        args['event_log'] = f'{sub_folder}/match_{parsed_options.match_id}{extension}'
     return args
 
 
@@ -965,29 +1178,48 @@ def random_layout(seed=None):
     # layout = 'layouts/random%08dCapture.lay' % seed
     # print 'Generating random layout in %s' % layout
     import contest.maze_generator as maze_generator
-    return f'RANDOM{seed}', maze_generator.generate_maze(seed)
+    return f'RANDOM{seed}', maze_generator.get_maze(seed)
 
 
-def load_agents(is_red, agent_file, cmd_line_args):
-    """Calls agent factories and returns lists of agents"""
-    try:
-        if not agent_file.endswith(".py"):
-            agent_file += ".py"
+# Team modules by (absolute path, is_red): a process imports every team once per side
+# (see worker_pool.py). The sides get their own module, so that a team playing against
+# itself does not share its module globals with its opponent.
+TEAM_MODULES = {}
+
 
-        module_name = pathlib.Path(agent_file).stem
-        agent_file = os.path.abspath(agent_file)
+def load_team_module(agent_file, is_red):
+    """Imports the module of a team file for a side, or returns it if this process already did"""
+    import importlib.machinery
+    import importlib.util
+    if not agent_file.endswith(".py"):
+        agent_file += ".py"
+    agent_file = os.path.abspath(agent_file)
+    if (agent_file, is_red) in TEAM_MODULES:
+        return TEAM_MODULES[agent_file, is_red]
 
-        # just in case other files not in the distribution are loaded
-        sys.path.append(os.path.split(agent_file)[0])
+    module_name = os.path.splitext(os.path.basename(agent_file))[0]
 
-        print(f"Loading agent team: {agent_file}")
+    # just in case other files not in the distribution are loaded
+    team_folder = os.path.split(agent_file)[0]
+    if team_folder not in sys.path:
+        sys.path.append(team_folder)
 
-        # SS: new way of loading Python modules - Python 3.4+
-        loader = importlib.machinery.SourceFileLoader(module_name, agent_file)
-        spec = importlib.util.spec_from_loader(module_name, loader)
-        module = importlib.util.module_from_spec(spec)
-        loader.exec_module(module)  # will be added to sys.modules dict
+    print(f"Loading agent team: {agent_file}")
 
+    # SS: new way of loading Python modules - Python 3.4+
+    loader = importlib.machinery.SourceFileLoader(module_name, agent_file)
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    TEAM_MODULES[agent_file, is_red] = module
+    return module
+
+
+def load_agents(is_red, agent_file, cmd_line_args):
+    """Calls agent factories and returns lists of agents"""
+    import traceback
+    try:
+        module = load_team_module(agent_file, is_red)
     except (NameError, ImportError):
         print('Error: The team "' + agent_file + '" could not be loaded! ', file=sys.stderr)
         traceback.print_exc()
@@ -1021,7 +1253,7 @@ def load_agents(is_red, agent_file, cmd_line_args):
 
 def replay_game(layout, agents, actions, display, length, red_team_name, blue_team_name, wait_end=True, delay=1):
     rules = CaptureRules()
-    game = rules.new_game(layout, agents, display, length, False, False)
+    game = rules.new_game(layout, agents, display, length, False, False, warm_up=False)
     state = game.state
     display.red_team = red_team_name
     display.blue_team = blue_team_name
@@ -1038,15 +1270,9 @@ def replay_game(layout, agents, actions, display, length, red_team_name, blue_te
 
     game.game_over = True
     if not game.rules.quiet:
-        red_count = 0
-        blue_count = 0
+        red_count = state.data.team_returned[RED_TEAM]
+        blue_count = state.data.team_returned[BLUE_TEAM]
         food_to_win = (TOTAL_FOOD / 2) - MIN_FOOD
-        for index in range(state.get_num_agents()):
-            agent_state = state.data.agent_states[index]
-            if index in state.get_red_team_indices():
-                red_count += agent_state.num_returned
-            else:
-                blue_count += agent_state.num_returned
 
         if blue_count >= food_to_win:  # state.getRedFood().count() == MIN_FOOD:
             print(f'The Blue team has returned at least {food_to_win} of the opponents\' dots.')
@@ -1072,8 +1298,11 @@ def replay_game(layout, agents, actions, display, length, red_team_name, blue_te
 
 
 def run_games(layouts, agents, display, length, num_games, record, num_training, red_team_name, blue_team_name,
-              contest_name="default", mute_agents=False, catch_exceptions=False, delay_step=0, match_id=0):
+              contest_name="default", mute_agents=False, catch_exceptions=False, delay_step=0, match_id=0,
+              event_log=None):
     rules = CaptureRules()
+    if event_log is not None:
+        rules.events.subscribe(JsonlWriter(event_log))
     games_list = []
 
     if num_training > 0:
@@ -1117,6 +1346,7 @@ def run_games(layouts, agents, display, length, num_games, record, num_training,
         print(f'Red Win Rate:  {[s > 0 for s in scores].count(True)}/{len(scores)} ({red_win_rate:.2f})')
         print(f'Blue Win Rate: {[s < 0 for s in scores].count(True)}/{len(scores)} ({blue_win_rate:.2f})')
         print('Record:       ', ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
+    rules.events.close()
     return games_list
 
 
@@ -1183,6 +1413,11 @@ def save_score(games, total_time, *, contest_name, match_id, **kwargs):
         # print(games.state.data.score, file=f)
         f.write(json.dumps(match_data, sort_keys=True, indent=4))
 
+    # The leaderboard of the contest is updated with the match, see results.py
+    from contest.results import ResultStore
+    with ResultStore(f'www/contest_{contest_name}/results.db') as store:
+        store.append_games(games_data, max_steps=games[0].length)
+
 
 def run(args):
     """
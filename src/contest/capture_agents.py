@@ -48,7 +48,7 @@ class RandomAgent(Agent):
         self.index = index
 
     def get_action(self, state):
-        return random.choice(state.get_legal_actions(self.index))
+        return self.rng.choice(state.get_legal_actions(self.index))
 
 
 class CaptureAgent(Agent):
@@ -286,7 +286,7 @@ class CaptureAgent(Agent):
 
         The arg distributions is a tuple or list of util.Counter objects, where the i-th
         Counter has keys that are board positions (x,y) and values that encode the probability
-        that agent i is at (x,y).
+        that agent i is at (x,y). inference.BeliefGrid objects are accepted as well.
 
         If some elements are None, then they will be ignored.  If a Counter is passed to this
         function, it will be displayed. This is helpful for figuring out if your agent is doing
@@ -295,7 +295,9 @@ class CaptureAgent(Agent):
         dists = []
         for dist in distributions:
             if dist is not None:
-                if not isinstance(dist, util.Counter): raise Exception("Wrong type of distribution")
+                if not isinstance(dist, util.Counter):
+                    from contest.inference import BeliefGrid
+                    if not isinstance(dist, BeliefGrid): raise Exception("Wrong type of distribution")
                 dists.append(dist)
             else:
                 dists.append(util.Counter())
@@ -13,6 +13,7 @@
 
 import os
 import math
+import threading
 from contest.game import Directions
 from contest.graphics_utils import *
 
@@ -75,6 +76,17 @@ CAPSULE_SIZE = 0.25
 # Drawing walls
 WALL_RADIUS = 0.15
 
+# Belief overlays: colour channels are rounded to this many levels, so that
+# tiny changes in a belief do not repaint its cell, and the overlay is redrawn
+# at most this many times per second
+DISTRIBUTION_COLOR_LEVELS = 32
+DISTRIBUTION_FPS = 20
+
+# Threaded display: frames drawn per second, and drawing commands the game can
+# queue before they are compacted (see ThreadedPacmanGraphics)
+RENDER_FPS = 30
+RENDER_QUEUE_SIZE = 64
+
 
 class InfoPane:
     def __init__(self, layout, grid_size, red_team, blue_team):
@@ -221,7 +233,51 @@ class InfoPane:
         pass
 
 
+class StateDelta:
+    """
+    What a move changed on the board: the agent that moved, food eaten and
+    dumped, capsules eaten, score and time left. A delta is merged with the
+    deltas of the next moves when the display is behind, so that it draws
+    the latest state at once instead of every intermediate frame.
+    """
+
+    def __init__(self, state=None):
+        self.agents = {}  # agent index -> AgentState
+        self.food_changes = []  # (position, added), in the order they happened
+        self.capsules_eaten = []
+        self.score = 0
+        self.timeleft = None
+        self.ghost_distances = None
+        self.num_moves = 0
+        if state is not None:
+            self.agents[state._agent_moved] = state.agent_states[state._agent_moved]
+            if state._food_eaten is not None:
+                self.food_changes.append((state._food_eaten, False))
+            if state._food_added is not None:
+                self.food_changes.extend((pos, True) for pos in state._food_added)
+            if state._capsule_eaten is not None:
+                self.capsules_eaten.append(state._capsule_eaten)
+            self.score, self.timeleft = state.score, state.timeleft
+            self.ghost_distances = getattr(state, 'ghost_distances', None)
+            self.num_moves = 1
+
+    def merge(self, later):
+        """Adds the changes of the delta that follows this one; returns self"""
+        self.agents.update(later.agents)
+        self.food_changes.extend(later.food_changes)
+        self.capsules_eaten.extend(later.capsules_eaten)
+        self.score, self.timeleft = later.score, later.timeleft
+        if later.ghost_distances is not None:
+            self.ghost_distances = later.ghost_distances
+        self.num_moves += later.num_moves
+        return self
+
+
 class PacmanGraphics:
+    # Latest distributions not drawn yet, waiting for the next overlay frame
+    pending_distributions = None
+    last_distribution_time = 0.0
+
     def __init__(self, red_team, red_name, blue_team, blue_name, zoom=1.0, frame_time=0.0, capture=False):
         self.expanded_cells = []
         self.have_window = 0
@@ -276,6 +332,9 @@ class PacmanGraphics:
                                filled=1, behind=2)
                 dist_x.append(block)
         self.distribution_images = dist
+        # Colour on screen of every cell, and the cells that are not background
+        self.distribution_colors = [[BACKGROUND_COLOR] * walls.height for _ in range(walls.width)]
+        self.distribution_lit = set()
 
     def draw_static_objects(self, state):
         layout = self.layout
@@ -310,30 +369,39 @@ class PacmanGraphics:
         refresh()
 
     def update(self, new_state):
-        agent_index = new_state._agent_moved
-        agent_state = new_state.agent_states[agent_index]
+        if self.pending_distributions is not None:
+            self.update_distributions(self.pending_distributions)
+        self.apply_delta(StateDelta(new_state))
 
-        if self.agent_images[agent_index][0].is_pacman != agent_state.is_pacman:
-            self.swap_images(agent_index, agent_state)
-        prev_state, prev_image = self.agent_images[agent_index]
-        if agent_state.is_pacman:
-            self.animate_pacman(agent_state, prev_state, prev_image)
-        else:
-            self.move_ghost(agent_state, agent_index, prev_state, prev_image)
-        self.agent_images[agent_index] = (agent_state, prev_image)
-
-        if new_state._food_eaten is not None:
-            self.remove_food(new_state._food_eaten, self.food)
-        if new_state._capsule_eaten is not None:
-            self.remove_capsule(new_state._capsule_eaten, self.capsules)
-        # dumping food
-        if new_state._food_added is not None:
-            for foodPos in new_state._food_added:
-                self.add_food(foodPos, self.food, new_state.layout)
-
-        self.info_pane.update_score(new_state.score, new_state.timeleft)
-        if 'ghost_distances' in dir(new_state):
-            self.info_pane.update_ghost_distances(new_state.ghost_distances)
+    def apply_delta(self, delta, animate=True):
+        """
+        Draws the changes of a StateDelta. Pacmen are animated from their
+        previous positions when animate is set, otherwise they are moved
+        straight to their new positions.
+        """
+        for agent_index, agent_state in delta.agents.items():
+            if self.agent_images[agent_index][0].is_pacman != agent_state.is_pacman:
+                self.swap_images(agent_index, agent_state)
+            prev_state, prev_image = self.agent_images[agent_index]
+            if not agent_state.is_pacman:
+                self.move_ghost(agent_state, agent_index, prev_state, prev_image)
+            elif animate:
+                self.animate_pacman(agent_state, prev_state, prev_image)
+            else:
+                self.move_pacman(self.get_position(agent_state), self.get_direction(agent_state), prev_image)
+            self.agent_images[agent_index] = (agent_state, prev_image)
+
+        for food_pos, added in delta.food_changes:
+            if added:
+                self.add_food(food_pos, self.food, self.layout)
+            else:
+                self.remove_food(food_pos, self.food)
+        for capsule in delta.capsules_eaten:
+            self.remove_capsule(capsule, self.capsules)
+
+        self.info_pane.update_score(delta.score, delta.timeleft)
+        if delta.ghost_distances is not None:
+            self.info_pane.update_ghost_distances(delta.ghost_distances)
 
     def make_window(self, width, height):
         grid_width = (width - 1) * self.grid_size
@@ -744,23 +812,51 @@ class PacmanGraphics:
                 remove_from_screen(cell)
 
     def update_distributions(self, distributions):
-        """Draws an agent's belief distributions"""
+        """
+        Draws an agent's belief distributions. Calls less than a frame apart
+        (see DISTRIBUTION_FPS) are coalesced: the latest distributions wait
+        for the first call or update after the frame.
+        """
+        self.pending_distributions = distributions
+        if time.time() - self.last_distribution_time >= 1.0 / DISTRIBUTION_FPS:
+            self.draw_pending_distributions()
+
+    def draw_pending_distributions(self):
+        """Draws the pending distributions, repainting only the cells whose colour changed"""
+        distributions = self.pending_distributions
+        self.pending_distributions = None
+        self.last_distribution_time = time.time()
         if self.distribution_images is None:
             self.draw_distributions(self.previous_state)
-        for x in range(len(self.distribution_images)):
-            for y in range(len(self.distribution_images[0])):
-                image = self.distribution_images[x][y]
-                weights = [dist[(x, y)] for dist in distributions]
-
-                if sum(weights) != 0:
-                    pass
-                # Fog of war
-                color = [0.0, 0.0, 0.0]
-                colors = GHOST_VEC_COLORS[1:]  # With Pacman
-                if self.capture: colors = GHOST_VEC_COLORS
-                for weight, g_color in zip(weights, colors):
-                    color = [min(1.0, c + 0.95 * g * weight ** .3) for c, g in zip(color, g_color)]
-                change_color(image, format_color(*color))
+        width, height = len(self.distribution_images), len(self.distribution_images[0])
+
+        # Fog of war: black, lit by the weight of every distribution on the cell
+        colors = GHOST_VEC_COLORS[1:]  # With Pacman
+        if self.capture: colors = GHOST_VEC_COLORS
+        cell_colors = {}
+        for dist, g_color in zip(distributions, colors):
+            for (x, y), weight in dist.items():
+                x, y = int(x), int(y)
+                if weight <= 0 or not (0 <= x < width and 0 <= y < height):
+                    continue
+                color = cell_colors.setdefault((x, y), [0.0, 0.0, 0.0])
+                light = 0.95 * weight ** .3
+                for c in range(3):
+                    color[c] = min(1.0, color[c] + g_color[c] * light)
+
+        levels = float(DISTRIBUTION_COLOR_LEVELS)
+        lit = set()
+        for x, y in self.distribution_lit.union(cell_colors):
+            color = cell_colors.get((x, y))
+            if color is None:
+                color = BACKGROUND_COLOR
+            else:
+                color = format_color(*[round(c * levels) / levels for c in color])
+                if color != BACKGROUND_COLOR: lit.add((x, y))
+            if color != self.distribution_colors[x][y]:
+                change_color(self.distribution_images[x][y], color)
+                self.distribution_colors[x][y] = color
+        self.distribution_lit = lit
         refresh()
 
 
@@ -810,6 +906,123 @@ class FirstPersonPacmanGraphics(PacmanGraphics):
             return PacmanGraphics.get_position(self, ghost_state)
 
 
+class ThreadedPacmanGraphics(PacmanGraphics):
+    """
+    A PacmanGraphics drawn by its own thread, which owns the Tk window, so
+    that the game does not wait for the screen. The game queues the deltas
+    of its moves (and the drawings of the agents) and returns at once; the
+    render thread draws what is queued at most fps times per second. When
+    several moves are waiting, they are merged and drawn as one frame, so a
+    slow screen drops frames instead of slowing the game down.
+
+    The only exception is step-debug mode (frame_time < 0): every move is
+    drawn and the game waits for the key press that steps it forward.
+    """
+
+    def __init__(self, red_team, red_name, blue_team, blue_name, zoom=1.0, frame_time=0.0, capture=False,
+                 fps=RENDER_FPS, max_queued=RENDER_QUEUE_SIZE):
+        PacmanGraphics.__init__(self, red_team, red_name, blue_team, blue_name, zoom, frame_time, capture)
+        self.fps = fps
+        self.max_queued = max_queued
+        self.queue = []  # (method name, args, event set once drawn or None)
+        self.queue_lock = threading.Lock()
+        self.render_thread = None
+        self.dropped_frames = 0
+
+    def initialize(self, state, is_blue=False):
+        self.queue = []
+        self.dropped_frames = 0
+        self.render_thread = threading.Thread(target=self.render, args=(state, is_blue), name='render',
+                                              daemon=True)
+        self.render_thread.start()
+
+    def update(self, new_state):
+        if self.frame_time < 0:
+            drawn = threading.Event()
+            self.push('apply_delta', (StateDelta(new_state),), drawn)
+            while not drawn.wait(0.1):
+                if not self.render_thread.is_alive(): break
+        else:
+            self.push('apply_delta', (StateDelta(new_state),))
+
+    def update_distributions(self, distributions):
+        self.push('update_distributions', ([dist.copy() for dist in distributions],))
+
+    def debug_draw(self, cells, color=[1.0, 0.0, 0.0], clear=False):
+        self.push('debug_draw', (list(cells), color, clear))
+
+    def clear_debug(self):
+        self.push('clear_debug', ())
+
+    def draw_expanded_cells(self, cells):
+        self.push('draw_expanded_cells', (list(cells),))
+
+    def clear_expanded_cells(self):
+        self.push('clear_expanded_cells', ())
+
+    def finish(self):
+        """Waits for the queued frames to be drawn and closes the window"""
+        if self.render_thread is None: return
+        self.push('finish', ())
+        self.render_thread.join()
+        self.render_thread = None
+
+    def push(self, name, args, drawn=None):
+        with self.queue_lock:
+            self.queue.append((name, args, drawn))
+            if len(self.queue) > self.max_queued:
+                self.queue = self.compact(self.queue)
+                if len(self.queue) > self.max_queued:
+                    # Only the drawings of agents can fill the queue that much
+                    del self.queue[0]
+                    self.dropped_frames += 1
+
+    def compact(self, commands):
+        """
+        Merges the consecutive deltas of the commands into one and keeps
+        only the last distributions, which replace the previous ones.
+        Deltas someone waits for are left alone.
+        """
+        last_distributions = max([i for i, (name, _, _) in enumerate(commands) if name == 'update_distributions'],
+                                 default=None)
+        compacted = []
+        for i, (name, args, drawn) in enumerate(commands):
+            if name == 'update_distributions' and i != last_distributions:
+                self.dropped_frames += 1
+                continue
+            if name == 'apply_delta' and drawn is None and compacted:
+                prev_name, prev_args, prev_drawn = compacted[-1]
+                if prev_name == 'apply_delta' and prev_drawn is None:
+                    prev_args[0].merge(args[0])
+                    self.dropped_frames += 1
+                    continue
+            compacted.append((name, args, drawn))
+        return compacted
+
+    def render(self, state, is_blue):
+        """The render thread: draws the queued commands, a frame at a time"""
+        PacmanGraphics.initialize(self, state, is_blue)
+        while True:
+            start = time.time()
+            with self.queue_lock:
+                commands, self.queue = self.compact(self.queue), []
+            for name, args, drawn in commands:
+                if name == 'finish':
+                    PacmanGraphics.finish(self)
+                    return
+                if name == 'apply_delta':
+                    # Merged moves jump to their last positions
+                    PacmanGraphics.apply_delta(self, args[0], animate=args[0].num_moves == 1)
+                else:
+                    getattr(PacmanGraphics, name)(self, *args)
+                if drawn is not None:
+                    drawn.set()
+            if self.pending_distributions is not None:
+                PacmanGraphics.update_distributions(self, self.pending_distributions)
+            refresh()
+            sleep(max(0.0, 1.0 / self.fps - (time.time() - start)))
+
+
 def add(x, y):
     return x[0] + y[0], x[1] + y[1]
 
@@ -94,9 +94,6 @@ def get_grids_1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
-distanceMap = {}
-
-
 class DistanceCalculator:
     def __init__(self, layout, distancer, default=10000):
         self.layout = layout
@@ -104,15 +101,8 @@ class DistanceCalculator:
         self.default = default
 
     def run(self):
-        global distanceMap
-
-        if self.layout.walls not in distanceMap:
-            distances = compute_distances(self.layout)
-            distanceMap[self.layout.walls] = distances
-        else:
-            distances = distanceMap[self.layout.walls]
-
-        self.distancer._distances = distances
+        # Computed once per layout and shared through the layout registry
+        self.distancer._distances = self.layout.get_maze_distances()
 
 
 def compute_distances(layout):
@@ -0,0 +1,192 @@
+# events.py
+# ---------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Typed events of a game and the subscribers that consume them.
+
+The engine (Game.run and CaptureRules) emits every event through the
+EventLog of the game instead of printing it. An event is a dict with its
+type under 'event', a 'timestamp' and the fields of its type:
+
+  game_start  layout, num_agents, length, starter (0 red, 1 blue)
+  move        agent, action, elapsed (seconds the agent took), score, timeleft
+  eat         agent, position, kind ('food' or 'capsule')
+  return      agent, count (food returned), score
+  death       agent, position, killer, dropped (food it was carrying)
+  warning     agent, count (warnings of the agent so far)
+  timeout     agent, phase ('startup', 'move', 'warnings' or 'total'), elapsed
+  crash       agent, message, traceback (None when unknown)
+  end         reason ('food', 'time' or 'crash'), team, score, winner, food_to_win
+
+Subscribers are callables taking the event. EventPrinter prints the usual
+human-readable messages, and JsonlWriter appends the events to a JSON lines
+file (gzipped if its name ends in .gz), buffered and flushed periodically.
+"""
+
+import json
+import sys
+import time
+
+FLUSH_INTERVAL = 1.0  # seconds between flushes of a JsonlWriter
+MAX_BUFFERED_EVENTS = 1000
+
+
+class EventLog:
+    """
+    Dispatches the events of a game to its subscribers. Subscribers with
+    an event_types attribute only get the events of those types, and events
+    nobody wants are not even built (see wants).
+    """
+
+    def __init__(self, subscribers=()):
+        self.subscribers = []
+        self.wanted = set()
+        self.wants_all = False
+        for subscriber in subscribers:
+            self.subscribe(subscriber)
+
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+        self._update_wanted()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+        self._update_wanted()
+
+    def _update_wanted(self):
+        event_types = [getattr(subscriber, 'event_types', None) for subscriber in self.subscribers]
+        self.wants_all = any(types is None for types in event_types)
+        self.wanted = set().union(*[types for types in event_types if types is not None])
+
+    def wants(self, event_type):
+        return self.wants_all or event_type in self.wanted
+
+    def emit(self, event_type, **fields):
+        if not (self.wants_all or event_type in self.wanted):
+            return
+        fields['event'] = event_type
+        fields['timestamp'] = time.time()
+        for subscriber in self.subscribers:
+            types = getattr(subscriber, 'event_types', None)
+            if types is None or event_type in types:
+                subscriber(fields)
+
+    def close(self):
+        for subscriber in self.subscribers:
+            if hasattr(subscriber, 'close'):
+                subscriber.close()
+
+
+class EventPrinter:
+    """
+    Prints the events as the messages of the engine: the outcome of the
+    game on stdout, unless the rules are quiet, and the problems of the
+    agents on stderr.
+    """
+    event_types = {'game_start', 'warning', 'timeout', 'crash', 'end'}
+
+    def __init__(self, rules=None):
+        self.rules = rules
+
+    def __call__(self, event):
+        getattr(self, 'print_' + event['event'])(event)
+
+    def print_game_start(self, event):
+        print('%s team starts' % ['Red', 'Blue'][event['starter']])
+
+    def print_warning(self, event):
+        print(f"Agent {event['agent']} took too long to make a move! This is warning {event['count']}",
+              file=sys.stderr)
+
+    def print_timeout(self, event):
+        agent, phase = event['agent'], event['phase']
+        if phase == 'startup':
+            print(f"Agent {agent} ran out of time on startup!", file=sys.stderr)
+        elif phase == 'move':
+            print(f"Agent {agent} timed out on a single move!", file=sys.stderr)
+        elif phase == 'warnings':
+            print(f"Agent {agent} exceeded the maximum number of warnings: {event['count']}", file=sys.stderr)
+        else:
+            print(f"Agent {agent} ran out of time! (time: {event['elapsed']:1.2f})", file=sys.stderr)
+
+    def print_crash(self, event):
+        if event['traceback'] is not None:
+            print(event['traceback'], end='', file=sys.stderr)
+        if event['message'] is not None:
+            print(event['message'], file=sys.stderr)
+
+    def print_end(self, event):
+        if event['reason'] == 'crash':
+            print(f"{event['team']} agent crashed", file=sys.stderr)
+            return
+        if self.rules is not None and self.rules.quiet:
+            return
+        if event['reason'] == 'food':
+            print(f"The {event['team']} team has returned at least {event['food_to_win']} of the opponents' dots.")
+        else:
+            print('Time is up.')
+            if event['score'] == 0:
+                print('Tie game!')
+            else:
+                print(f"The {event['winner']} team wins by {abs(event['score'])} points.")
+
+
+class JsonlWriter:
+    """
+    Appends the events to a file, one JSON object per line. Lines are
+    buffered and written every flush_interval seconds, every max_buffered
+    events, at the end of every game and on close. The file is gzipped
+    when compress is set, by default when its name ends in .gz.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, max_buffered=MAX_BUFFERED_EVENTS, compress=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        if compress is None:
+            compress = path.endswith('.gz')
+        import gzip
+        self.file = gzip.open(path, 'at', encoding='utf-8') if compress else open(path, 'a', encoding='utf-8')
+        self.buffer = []
+        self.last_flush = time.time()
+
+    def __call__(self, event):
+        self.buffer.append(json.dumps(event, separators=(',', ':'), default=str))
+        if event['event'] == 'end' or len(self.buffer) >= self.max_buffered or \
+                event['timestamp'] - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+        self.last_flush = time.time()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def read_events(path):
+    """Yields the events of a file written by a JsonlWriter"""
+    import gzip
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
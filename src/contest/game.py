@@ -21,14 +21,15 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 from contest.util import *
+from contest.events import EventLog, EventPrinter
 import time, os
-import traceback
+import random
 import sys
+import traceback
 
-# https://github.com/slezica/python-frozendict 
-# was rejected from PEP but may be considered soon:
-#   https://www.python.org/dev/peps/pep-0603/
-from frozendict import frozendict
+# A read-only view standing in for a frozendict (PEP 603 was rejected), which
+# costs nothing to import, unlike the frozendict package
+from types import MappingProxyType as frozendict
 
 
 #######################
@@ -41,10 +42,18 @@ class Agent:
     following methods which will be called if they exist:
 
     def register_initial_state(self, state): # inspects the starting state
+
+    Agents should draw their random numbers from self.rng, a random.Random
+    that the rules replace with a stream of the game (see
+    CaptureRules.new_game), so that games are reproducible from their seed
+    even when several run in the same process. search.MonteCarloTreeSearch
+    draws from the rng of its agent by default, for the same reason.
     """
 
     def __init__(self, index=0):
         self.index = index
+        # Seeded from the random module, so that random.seed still makes the agents outside a game reproducible
+        self.rng = random.Random(random.getrandbits(64))
 
     def get_action(self, state):
         """
@@ -202,6 +211,8 @@ class Grid:
 
     def __eq__(self, other):
         if other is None: return False
+        if type(self.data) is not type(other.data):  # one of them is frozen
+            return list(map(list, self.data)) == list(map(list, other.data))
         return self.data == other.data
 
     def __hash__(self):
@@ -217,7 +228,7 @@ class Grid:
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.data = [list(x) for x in self.data]
         return g
 
     def deep_copy(self):
@@ -228,6 +239,10 @@ class Grid:
         g.data = self.data
         return g
 
+    def freeze(self):
+        """Makes the grid read-only, for grids shared between games (copies are writable)"""
+        self.data = tuple(tuple(x) for x in self.data)
+
     def count(self, item=True):
         return sum([x.count(item) for x in self.data])
 
@@ -384,17 +399,30 @@ class Actions:
 
 
 class GameStateData:
-    def __init__(self, prev_state=None):
+    def __init__(self, prev_state=None, copy_agent_states=True):
         """
         Generates a new data packet by copying information from its predecessor.
+        With copy_agent_states=False the agent states are shared with it instead.
         """
         if prev_state is not None:
             self.food = prev_state.food.shallow_copy()
             self.capsules = prev_state.capsules[:]
-            self.agent_states = self.copy_agent_states(prev_state.agent_states)
+            if copy_agent_states:
+                self.agent_states = self.copy_agent_states(prev_state.agent_states)
+            else:
+                self.agent_states = prev_state.agent_states[:]
             self.layout = prev_state.layout
             self._eaten = prev_state._eaten
             self.score = prev_state.score
+            self.agent_teams = prev_state.agent_teams
+            self.team_carrying = prev_state.team_carrying[:]
+            self.team_returned = prev_state.team_returned[:]
+        else:
+            # Team of each agent index (fixed for the whole game) and running
+            # food totals per team, kept up to date by the game rules
+            self.agent_teams = None
+            self.team_carrying = [0, 0]
+            self.team_returned = [0, 0]
 
         self.timeleft = None
         self._food_eaten = None
@@ -543,7 +571,8 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__(self, agents, display, rules, starting_index=0, mute_agents=False, catch_exceptions=False):
+    def __init__(self, agents, display, rules, starting_index=0, mute_agents=False, catch_exceptions=False,
+                 events=None):
         self.num_moves = None
         self.state = None
         self.agent_crashed = False
@@ -562,6 +591,8 @@ class Game:
         self.agent_output = [io.StringIO() for _ in agents]
         self.OLD_STDOUT = None
         self.OLD_STDERR = None
+        # Problems of the agents and the outcome are reported as events (see events.py)
+        self.events = events if events is not None else EventLog([EventPrinter(rules)])
 
     def get_progress(self):
         if self.game_over:
@@ -569,9 +600,10 @@ class Game:
         else:
             return self.rules.get_progress(self)
 
-    def _agent_crash(self, agent_index, quiet=False):
+    def _agent_crash(self, agent_index, quiet=False, message=None):
         """Helper method for handling agent crashes"""
-        if not quiet: traceback.print_exc()
+        self.events.emit('crash', agent=agent_index, message=message,
+                         traceback=None if quiet else traceback.format_exc())
         self.game_over = True
         self.agent_crashed = True
         self.rules.agent_crash(self, agent_index)
@@ -601,12 +633,9 @@ class Game:
         for i in range(len(self.agents)):
             agent = self.agents[i]
             if not agent:
-                self.mute(i)
                 # this is a null agent, meaning it failed to load
                 # the other team wins
-                print(f"Agent {i} failed to load", file=sys.stderr)
-                self.unmute()
-                self._agent_crash(i, quiet=True)
+                self._agent_crash(i, quiet=True, message=f"Agent {i} failed to load")
                 return
             if "register_initial_state" in dir(agent):
                 self.mute(i)
@@ -620,7 +649,7 @@ class Game:
                             time_taken = time.time() - start_time
                             self.total_agent_times[i] += time_taken
                         except TimeoutFunctionException:
-                            print(f"Agent {i} ran out of time on startup!", file=sys.stderr)
+                            self.events.emit('timeout', agent=i, phase='startup', elapsed=time.time() - start_time)
                             self.unmute()
                             self.agent_timeout = True
                             self._agent_crash(i, quiet=True)
@@ -680,7 +709,8 @@ class Game:
                             raise TimeoutFunctionException()
                         action = timed_func(observation)
                     except TimeoutFunctionException:
-                        print(f"Agent {agent_index} timed out on a single move!", file=sys.stderr)
+                        self.events.emit('timeout', agent=agent_index, phase='move',
+                                         elapsed=move_time + time.time() - start_time)
                         self.agent_timeout = True
                         self._agent_crash(agent_index, quiet=True)
                         self.unmute()
@@ -690,11 +720,11 @@ class Game:
 
                     if move_time > self.rules.get_move_warning_time():
                         self.total_agent_time_warnings[agent_index] += 1
-                        print(f"Agent {agent_index} took too long to make a move! This is warning "
-                              f"{self.total_agent_time_warnings[agent_index]}", file=sys.stderr)
+                        self.events.emit('warning', agent=agent_index,
+                                         count=self.total_agent_time_warnings[agent_index])
                         if self.total_agent_time_warnings[agent_index] > self.rules.get_max_time_warnings():
-                            print(f"Agent {agent_index} exceeded the maximum number of warnings: "
-                                  f"{self.total_agent_time_warnings[agent_index]}", file=sys.stderr)
+                            self.events.emit('timeout', agent=agent_index, phase='warnings', elapsed=move_time,
+                                             count=self.total_agent_time_warnings[agent_index])
                             self.agent_timeout = True
                             self._agent_crash(agent_index, quiet=True)
                             self.unmute()
@@ -702,9 +732,8 @@ class Game:
 
                     self.total_agent_times[agent_index] += move_time
                     if self.total_agent_times[agent_index] > self.rules.get_max_total_time():
-                        print(
-                            f"Agent {agent_index} ran out of time! (time: {self.total_agent_times[agent_index]:1.2f})",
-                            file=sys.stderr)
+                        self.events.emit('timeout', agent=agent_index, phase='total',
+                                         elapsed=self.total_agent_times[agent_index])
                         self.agent_timeout = True
                         self._agent_crash(agent_index, quiet=True)
                         self.unmute()
@@ -720,6 +749,7 @@ class Game:
 
             # Execute the action
             self.move_history.append((agent_index, action))
+            previous_state = self.state
             if self.catch_exceptions:
                 try:
                     self.state = self.state.generate_successor(agent_index, action)
@@ -734,6 +764,12 @@ class Game:
             # Change the display
             self.display.update(self.state.data)
 
+            if self.events.wants('move'):
+                self.events.emit('move', agent=agent_index, action=action, elapsed=move_time,
+                                 score=self.state.data.score, timeleft=self.state.data.timeleft)
+            if hasattr(self.rules, 'emit_move_events'):
+                self.rules.emit_move_events(self, previous_state, agent_index, action)
+
             # Allow for game specific conditions (winning, losing, etc.)
             self.rules.process(self.state, self)
             # Track progress
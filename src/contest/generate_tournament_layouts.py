@@ -18,28 +18,31 @@ import contest.maze_generator as maze_generator
 """
 This is a helper file which generates the random seeds for the map
 layouts for the nightly tournament.
+
+The mazes are generated on a process pool, validated and written into the
+seed-keyed layout cache of maze_generator, so the games played on them as
+RANDOM<seed> load them from there instead of regenerating them.
+
+usage: python generate_tournament_layouts.py [num_maps] [num_processes]
 """
 
 if __name__=="__main__":
   num = 9
   if len(sys.argv) > 1: # command line argument: number of maps to generate
     num = int(sys.argv[1])
+  processes = None
+  if len(sys.argv) > 2: # command line argument: size of the process pool
+    processes = int(sys.argv[2])
+
+  seeds = random.sample(range(100000000), num)
+  print('Generating %d random layouts in %s' % (num, maze_generator.CACHE_DIR))
+  invalid = maze_generator.cache_mazes(seeds, processes=processes)
+  for seed, problems in invalid:
+    print('Skipping seed %d: %s' % (seed, '; '.join(problems)))
 
   seeds_file = '../driver/SEEDS'
   with open(seeds_file, 'w') as out:
-    pass
-
-  for i in range(num):
-    seed = random.randint(0,99999999)
-    layout = 'layouts/random%08dCapture.lay' % seed
-    print('Generating random layout in %s' % layout)
-    with open(layout, 'w') as out:
-      maze = maze_generator.generate_maze(seed)
-      out.write(maze)
-      print(maze)
-
-    with open(seeds_file, 'a') as out:
-      out.write("%d\n"%seed)
-
-
-
+    skipped = set(seed for seed, _ in invalid)
+    for seed in seeds:
+      if seed not in skipped:
+        out.write("%d\n"%seed)
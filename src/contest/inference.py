@@ -0,0 +1,325 @@
+# inference.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Exact inference over the positions of the opponents, which agents only see
+when a teammate is within sight and otherwise hear through the noisy sonar
+readings of GameState.get_agent_distances().
+
+Every opponent has a belief grid: a NumPy array of shape (width, height),
+indexed [x][y] like the layout, holding the probability that the opponent is
+on each cell. Every turn the beliefs are
+
+  * moved one step, assuming the opponent picks uniformly among its legal
+    actions (Stop included),
+  * multiplied by the sonar likelihood (capture.GameState.get_distance_prob),
+  * zeroed on the cells seen by the team, where the opponent would be visible,
+
+or collapsed on the observed position when the opponent is in sight. When no
+cell is left (the opponent was eaten and sent back to its start, typically)
+the belief is reset to the start position or, failing that, to every cell
+consistent with the readings.
+
+Example, from a CaptureAgent:
+  def register_initial_state(self, game_state):
+      CaptureAgent.register_initial_state(self, game_state)
+      self.beliefs = BeliefTracker(game_state, self.index)
+
+  def choose_action(self, game_state):
+      self.beliefs.observe(game_state)
+      self.display_distributions_over_positions(self.beliefs.to_belief_grids())
+      ...
+
+Beliefs are handed out as BeliefGrids, dense distributions over the cells
+of the layout that can stand in for the util.Counters of positions used
+elsewhere (see BeliefGrid).
+"""
+
+import random
+
+import numpy as np
+
+import contest.layout
+import contest.util as util
+from contest.capture import SONAR_NOISE_RANGE
+
+
+def get_layout_arrays(layout):
+    """
+    Returns (open_cells, inv_degree) for a layout: a boolean array of the
+    cells that are not walls, and for those one over the number of legal
+    actions (Stop included), zero on walls. Cached in the layout registry.
+    """
+    return contest.layout.REGISTRY.get_derived(layout, 'belief_arrays', compute_layout_arrays)
+
+
+def compute_layout_arrays(layout):
+    open_cells = ~np.array(layout.walls.data, dtype=bool)
+    degree = open_cells.astype(float)
+    degree[1:, :] += open_cells[1:, :] & open_cells[:-1, :]
+    degree[:-1, :] += open_cells[:-1, :] & open_cells[1:, :]
+    degree[:, 1:] += open_cells[:, 1:] & open_cells[:, :-1]
+    degree[:, :-1] += open_cells[:, :-1] & open_cells[:, 1:]
+    inv_degree = np.zeros(degree.shape)
+    np.divide(1.0, degree, out=inv_degree, where=open_cells)
+    return open_cells, inv_degree
+
+
+def mask_to_array(mask, width, height):
+    """Converts a cell bitmask (bit x * height + y, see capture.SightModel) to a boolean array."""
+    num_bytes = (width * height + 7) // 8
+    bits = np.unpackbits(np.frombuffer(mask.to_bytes(num_bytes, 'little'), dtype=np.uint8), bitorder='little')
+    return bits[:width * height].reshape(width, height).astype(bool)
+
+
+class BeliefGrid:
+    """
+    A distribution over the positions of a layout, stored as a float array
+    of shape (width, height) indexed [x][y], in values. It reads like a
+    util.Counter keyed by (x, y) (positions out of the board are 0), so it
+    can be passed wherever a Counter of positions is expected, e.g. to
+    CaptureAgent.display_distributions_over_positions, without copying.
+    Unlike a Counter, the arithmetic is vectorized over the whole board:
+
+    >>> grid = BeliefGrid.from_counter({(1, 1): 1.0, (2, 1): 3.0}, 4, 3)
+    >>> grid.normalize()
+    >>> grid[(2, 1)], grid.arg_max(), grid[(9, 9)]
+    (0.75, (2, 1), 0.0)
+    >>> [pos for pos in grid], (1, 1) in grid
+    ([(1, 1), (2, 1)], True)
+    >>> grid.multiply({(1, 1): 1.0}).normalize()
+    >>> grid.to_counter()
+    {(1, 1): 1.0}
+    """
+
+    def __init__(self, width, height, values=None):
+        self.width, self.height = width, height
+        self.values = np.zeros((width, height)) if values is None else values
+
+    @staticmethod
+    def from_array(values):
+        """Wraps an array of shape (width, height) without copying it"""
+        return BeliefGrid(values.shape[0], values.shape[1], values)
+
+    @staticmethod
+    def from_counter(counter, width, height):
+        """Returns the grid of a Counter (or dict) of positions"""
+        grid = BeliefGrid(width, height)
+        for (x, y), value in counter.items():
+            grid.values[int(x)][int(y)] = value
+        return grid
+
+    @staticmethod
+    def uniform(layout):
+        """Returns the uniform distribution over the open cells of the layout"""
+        open_cells, _ = get_layout_arrays(layout)
+        return BeliefGrid.from_array(open_cells / open_cells.sum())
+
+    def _as_array(self, other):
+        if isinstance(other, BeliefGrid):
+            return other.values
+        if isinstance(other, dict):
+            return BeliefGrid.from_counter(other, self.width, self.height).values
+        return other
+
+    def __getitem__(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return float(self.values[x, y])
+        return 0.0
+
+    def __setitem__(self, pos, value):
+        self.values[int(pos[0]), int(pos[1])] = value
+
+    def __len__(self):
+        return int(np.count_nonzero(self.values))
+
+    def __iter__(self):
+        """Iterates over the positions with non-zero probability, as keys does"""
+        return iter(self.keys())
+
+    def keys(self):
+        """The positions with non-zero probability"""
+        xs, ys = np.nonzero(self.values)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def items(self):
+        xs, ys = np.nonzero(self.values)
+        return list(zip(zip(xs.tolist(), ys.tolist()), self.values[xs, ys].tolist()))
+
+    def copy(self):
+        return BeliefGrid(self.width, self.height, self.values.copy())
+
+    def total_count(self):
+        return float(self.values.sum())
+
+    def normalize(self):
+        """Scales the grid in place so that it sums to 1 (a grid of zeros is left alone)"""
+        total = self.values.sum()
+        if total != 0:
+            self.values /= total
+
+    def multiply(self, other):
+        """Multiplies the grid in place, cell by cell, by a BeliefGrid, Counter, array or number; returns it"""
+        self.values *= self._as_array(other)
+        return self
+
+    def arg_max(self):
+        """Returns the position with the highest probability"""
+        x, y = np.unravel_index(np.argmax(self.values), self.values.shape)
+        return int(x), int(y)
+
+    def sample(self, rng=None, n=None):
+        """
+        Draws a position from the (not necessarily normalized) distribution,
+        or a list of n positions. rng is a random.Random, or the random module.
+        """
+        rng = rng or random
+        cumulative = np.cumsum(self.values, axis=None)
+        draws = [rng.random() * cumulative[-1] for _ in range(1 if n is None else n)]
+        cells = np.searchsorted(cumulative, draws, side='right').tolist()
+        positions = [divmod(min(cell, cumulative.size - 1), self.height) for cell in cells]
+        return positions[0] if n is None else positions
+
+    def to_counter(self):
+        """Returns the grid as a util.Counter of the positions with some probability"""
+        counter = util.Counter()
+        dict.update(counter, self.items())
+        return counter
+
+
+class BeliefTracker:
+    """
+    Tracks the beliefs of one agent about the positions of its opponents.
+    Call observe with every observation (usually first thing in
+    choose_action) and read the beliefs with get_belief,
+    get_most_likely_position or to_counter.
+    """
+
+    def __init__(self, game_state, agent_index):
+        self.index = agent_index
+        self.layout = game_state.data.layout
+        self.width, self.height = self.layout.width, self.layout.height
+        self.open_cells, self.inv_degree = get_layout_arrays(self.layout)
+
+        if game_state.is_on_red_team(agent_index):
+            self.team, self.opponents = game_state.get_red_team_indices(), game_state.get_blue_team_indices()
+        else:
+            self.team, self.opponents = game_state.get_blue_team_indices(), game_state.get_red_team_indices()
+        self.num_agents = game_state.get_num_agents()
+
+        # Cell coordinates, broadcast against each other to compute distances
+        self._xs = np.arange(self.width)[:, None]
+        self._ys = np.arange(self.height)[None, :]
+
+        self.beliefs = {}
+        self.observed = False
+        self.initialize(game_state)
+
+    def initialize(self, game_state):
+        """Puts every opponent on its start position."""
+        self.starts = {opponent: game_state.get_initial_agent_position(opponent) for opponent in self.opponents}
+        for opponent in self.opponents:
+            self.reset(opponent)
+        self.observed = False
+
+    def reset(self, opponent):
+        """Puts the opponent back on its start position, e.g. right after eating it."""
+        self.set_position(opponent, self.starts[opponent])
+
+    def set_position(self, opponent, pos):
+        self.beliefs[opponent] = self._point_belief(pos)
+
+    def _point_belief(self, pos):
+        belief = np.zeros((self.width, self.height))
+        belief[int(pos[0])][int(pos[1])] = 1.0
+        return belief
+
+    def observe(self, game_state):
+        """Updates the beliefs about every opponent with a new observation."""
+        my_pos = game_state.get_agent_position(self.index)
+        noisy_distances = game_state.get_agent_distances()
+        hidden = ~self.get_seen_cells(game_state)
+
+        for opponent in self.opponents:
+            pos = game_state.get_agent_position(opponent)
+            if pos is not None:
+                self.set_position(opponent, pos)
+                continue
+
+            if self.observed:
+                self.elapse_time(opponent)
+            evidence = hidden & self.open_cells
+            if noisy_distances and my_pos is not None:
+                evidence &= self.get_sonar_likelihood(my_pos, noisy_distances[opponent]) > 0
+            self.observe_evidence(opponent, evidence)
+        self.observed = True
+
+    def get_seen_cells(self, game_state):
+        """Returns a boolean array of the cells where the team would see an opponent."""
+        masks = game_state.sight_model.get_masks(self.layout)
+        seen = 0
+        for teammate in self.team:
+            seen |= masks.get(game_state.get_agent_position(teammate), 0)
+        return mask_to_array(seen, self.width, self.height)
+
+    def get_sonar_likelihood(self, my_pos, noisy_distance):
+        """Returns the probability of the noisy distance given the opponent on each cell."""
+        true_distances = np.abs(self._xs - int(my_pos[0])) + np.abs(self._ys - int(my_pos[1]))
+        likely = np.abs(noisy_distance - true_distances) <= (SONAR_NOISE_RANGE - 1) / 2
+        return likely * (1.0 / SONAR_NOISE_RANGE)
+
+    def elapse_time(self, opponent):
+        """Moves the opponent one step, every legal action being equally likely."""
+        out = self.beliefs[opponent] * self.inv_degree
+        belief = out.copy()
+        belief[1:, :] += out[:-1, :]
+        belief[:-1, :] += out[1:, :]
+        belief[:, 1:] += out[:, :-1]
+        belief[:, :-1] += out[:, 1:]
+        belief *= self.open_cells
+        self.beliefs[opponent] = belief
+
+    def observe_evidence(self, opponent, evidence):
+        """
+        Multiplies the belief by a likelihood array (the sonar likelihood
+        and the unseen cells, or any other) and normalizes it. When nothing is
+        left, falls back on the start position and then on the evidence alone.
+        """
+        for prior in (self.beliefs[opponent], self._point_belief(self.starts[opponent]), self.open_cells):
+            belief = prior * evidence
+            total = belief.sum()
+            if total > 0:
+                self.beliefs[opponent] = belief / total
+                return
+        self.beliefs[opponent] = self.open_cells / self.open_cells.sum()
+
+    def get_belief(self, opponent):
+        """Returns the belief of the opponent as a BeliefGrid sharing the tracker's array."""
+        return BeliefGrid.from_array(self.beliefs[opponent])
+
+    def get_most_likely_position(self, opponent):
+        return self.get_belief(opponent).arg_max()
+
+    def to_counter(self, opponent):
+        """Returns the belief as a util.Counter of the cells with some probability."""
+        return self.get_belief(opponent).to_counter()
+
+    def to_belief_grids(self):
+        """Returns the distributions for CaptureAgent.display_distributions_over_positions."""
+        return [self.get_belief(i) if i in self.beliefs else None for i in range(self.num_agents)]
+
+    def to_counters(self):
+        """Like to_belief_grids, with util.Counters."""
+        return [self.to_counter(i) if i in self.beliefs else None for i in range(self.num_agents)]
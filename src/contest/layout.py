@@ -13,17 +13,31 @@
 
 
 from contest.util import manhattan_distance
-from contest.game import Grid
+from contest.game import Grid, Actions
+import hashlib
 import os
 import random
+from collections import OrderedDict
 from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
 
+# Maximum number of derived artifacts (see LayoutRegistry.get_derived) kept alive
+MAX_DERIVED_ARTIFACTS = 32
+# Maximum number of interned layouts (see LayoutRegistry.intern), e.g. when generating RANDOM ones
+MAX_INTERNED_LAYOUTS = 64
+
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are never modified once parsed, so the same object is shared by
+    every game (and every copy of a game state) played on it; its walls and
+    food grids are frozen, so an agent cannot change them. Data derived
+    from the board (wall bitmask, legal actions, maze distances) is computed
+    lazily, or before the game starts (LayoutRegistry.warm_up), and cached by
+    the registry under the layout's content hash.
     """
 
     def __init__(self, layout_name, layout_text):
@@ -36,6 +50,8 @@ class Layout:
         self.agent_positions = []
         self.num_ghosts = 0
         self.process_layout_text(layout_text)
+        self.walls.freeze()
+        self.food.freeze()
         self.layout_text = layout_text
         self.total_food = len(self.food.as_list())
         # self.initializeVisibilityMatrix()
@@ -43,6 +59,27 @@ class Layout:
     def get_num_ghosts(self):
         return self.num_ghosts
 
+    @property
+    def content_hash(self):
+        """Hash of the layout text, shared by all the layouts with the same board."""
+        if '_content_hash' not in self.__dict__:
+            text = '\n'.join(self.layout_text)
+            self.__dict__['_content_hash'] = hashlib.sha1(text.encode()).hexdigest()
+        return self.__dict__['_content_hash']
+
+    def get_wall_bitmask(self):
+        """Returns the walls as an int where bit x * height + y is set if (x, y) is a wall."""
+        return REGISTRY.get_derived(self, 'wall_bitmask', compute_wall_bitmask)
+
+    def get_legal_actions_table(self):
+        """Returns a dict mapping every open (x, y) to the tuple of actions legal there."""
+        return REGISTRY.get_derived(self, 'legal_actions', compute_legal_actions_table)
+
+    def get_maze_distances(self):
+        """Returns the distance_calculator.compute_distances dict of this layout."""
+        import contest.distance_calculator as distance_calculator
+        return REGISTRY.get_derived(self, 'distances', distance_calculator.compute_distances)
+
     def initialize_visibility_matrix(self):
         global VISIBILITY_MATRIX_CACHE
         if reduce(str.__add__, self.layout_text) not in VISIBILITY_MATRIX_CACHE:
@@ -96,7 +133,8 @@ class Layout:
         return "\n".join(self.layout_text)
 
     def deep_copy(self):
-        return Layout(layout_name=self.layout_name, layout_text=self.layout_text[:])
+        # Layouts are immutable, so copies can share the parsed board
+        return self
 
     def process_layout_text(self, layout_text):
         """
@@ -136,22 +174,163 @@ class Layout:
             self.num_ghosts += 1
 
 
+def compute_wall_bitmask(layout):
+    bitmask = 0
+    for x, y in layout.walls.as_list():
+        bitmask |= 1 << (x * layout.height + y)
+    return bitmask
+
+
+def compute_legal_actions_table(layout):
+    walls = layout.walls
+    table = {}
+    for x, y in walls.as_list(False):
+        table[(x, y)] = tuple(direction for direction, (dx, dy) in Actions._directionsAsList
+                              if not walls[x + dx][y + dy])
+    return table
+
+
+def get_warmup_artifacts():
+    """The (artifact, compute) pairs of the layout data every game needs: walls, legal moves and distances."""
+    import contest.distance_calculator as distance_calculator
+    return [('wall_bitmask', compute_wall_bitmask),
+            ('legal_actions', compute_legal_actions_table),
+            ('distances', distance_calculator.compute_distances)]
+
+
+def compute_warmup_artifacts(layout):
+    return {artifact: compute(layout) for artifact, compute in get_warmup_artifacts()}
+
+
+class LayoutRegistry:
+    """
+    Process-wide store of layouts.
+
+    Layout names are resolved to files once, every file is parsed once, and
+    layouts are interned by name and content so that repeated games on the
+    same board share one Layout. Artifacts derived from a layout are kept in
+    an LRU cache keyed by content hash, so they survive across games but the
+    least recently used ones are dropped once there are more than
+    max_derived of them. Interned layouts are in an LRU cache too, of
+    max_layouts, as generated (RANDOM) layouts are new every game; the
+    resolved names and parsed files are not bounded, there are as many as
+    layout files on disk.
+    """
+
+    def __init__(self, max_derived=MAX_DERIVED_ARTIFACTS, max_layouts=MAX_INTERNED_LAYOUTS):
+        self.max_derived = max_derived
+        self.max_layouts = max_layouts
+        self._paths = {}
+        self._files = {}
+        self._layouts = OrderedDict()
+        self._derived = OrderedDict()
+
+    def resolve(self, name, back=2):
+        """
+        Returns the path of the layout file called name, looking for it (and for
+        layouts/name) in the current directory and up to back+1 parent directories.
+        """
+        key = (os.path.abspath('.'), name, back)
+        if key not in self._paths:
+            path = find_layout_file(name, back)
+            if path is None:
+                return None
+            self._paths[key] = path
+        return self._paths[key]
+
+    def get_layout(self, name, back=2):
+        path = self.resolve(name, back)
+        if path is None:
+            return None
+        if path not in self._files:
+            with open(path, 'r') as f:
+                layout_text = [line.strip() for line in f]
+            self._files[path] = self.intern(path[path.rfind('/') + 1:], layout_text)
+        return self._files[path]
+
+    def intern(self, layout_name, layout_text):
+        """Returns the shared Layout for this name and text, parsing it the first time."""
+        key = (layout_name, '\n'.join(layout_text))
+        if key in self._layouts:
+            self._layouts.move_to_end(key)
+            return self._layouts[key]
+        layout = self._layouts[key] = Layout(layout_name=layout_name, layout_text=layout_text)
+        while len(self._layouts) > self.max_layouts:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def get_derived(self, layout, artifact, compute):
+        """Returns compute(layout), cached under the layout content and the artifact name."""
+        key = (layout.content_hash, artifact)
+        if key in self._derived:
+            self._derived.move_to_end(key)
+            return self._derived[key]
+        value = compute(layout)
+        self.put_derived(layout, artifact, value)
+        return value
+
+    def has_derived(self, layout, artifact):
+        return (layout.content_hash, artifact) in self._derived
+
+    def put_derived(self, layout, artifact, value):
+        """Caches an artifact computed elsewhere (see warm_up)."""
+        self._derived[(layout.content_hash, artifact)] = value
+        self._derived.move_to_end((layout.content_hash, artifact))
+        while len(self._derived) > self.max_derived:
+            self._derived.popitem(last=False)
+
+    def warm_up(self, layouts, processes=1):
+        """
+        Computes the artifacts of get_warmup_artifacts() for the layouts that
+        are not cached yet, so that games find them ready. With processes > 1,
+        several distinct layouts are computed in parallel by a forked pool,
+        which is only safe before a display (Tk) is started: see
+        worker_pool.WarmWorkerPool.
+        """
+        missing = {}
+        for layout in layouts:
+            if not all(self.has_derived(layout, artifact) for artifact, _ in get_warmup_artifacts()):
+                missing.setdefault(layout.content_hash, layout)
+        # More would only evict the first ones before they are used
+        missing = dict(list(missing.items())[:max(1, self.max_derived // (2 * len(get_warmup_artifacts())))])
+        if len(missing) > 1 and processes > 1:
+            import multiprocessing
+            with multiprocessing.Pool(min(processes, len(missing))) as pool:
+                for layout, artifacts in zip(missing.values(), pool.map(compute_warmup_artifacts, missing.values())):
+                    for artifact, value in artifacts.items():
+                        self.put_derived(layout, artifact, value)
+        else:
+            for layout in missing.values():
+                for artifact, compute in get_warmup_artifacts():
+                    self.get_derived(layout, artifact, compute)
+
+    def clear(self):
+        self._paths.clear()
+        self._files.clear()
+        self._layouts.clear()
+        self._derived.clear()
+
+
+REGISTRY = LayoutRegistry()
+
+
+def find_layout_file(name, back=2):
+    if not name.endswith('.lay'):
+        name += '.lay'
+    directory = os.path.abspath('.')
+    for _ in range(back + 2):
+        for candidate in (os.path.join(directory, 'layouts', name), os.path.join(directory, name)):
+            if os.path.exists(candidate):
+                return candidate
+        directory = os.path.dirname(directory)
+    return None
+
+
 def get_layout(name, back=2):
-    if name.endswith('.lay'):
-        layout = try_to_load('layouts/' + name)
-        if layout is None: layout = try_to_load(name)
-    else:
-        layout = try_to_load('layouts/' + name + '.lay')
-        if layout is None: layout = try_to_load(name + '.lay')
-    if layout is None and back >= 0:
-        current_dir = os.path.abspath('.')
-        os.chdir('..')
-        layout = get_layout(name, back - 1)
-        os.chdir(current_dir)
-    return layout
+    return REGISTRY.get_layout(name, back)
 
 
 def try_to_load(fullname):
     if not os.path.exists(fullname): return None
     with open(fullname, 'r') as f:
-        return Layout(layout_name=fullname[fullname.rfind('/') + 1:], layout_text=[line.strip() for line in f])
+        return REGISTRY.intern(fullname[fullname.rfind('/') + 1:], [line.strip() for line in f])
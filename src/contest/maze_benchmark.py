@@ -0,0 +1,150 @@
+# maze_benchmark.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Stress test of the engine and the baseline agents on generated mazes of
+growing size. For every size it reports how long it takes to
+
+  * generate the maze (maze_generator.generate_maze),
+  * compute all the maze distances (Layout.get_maze_distances),
+  * generate a successor state (GameState.generate_successor),
+  * make a move with the baseline team (observation + get_action).
+
+The distance matrix holds one entry per pair of open cells, so it is skipped
+(together with the agents, which need it) above --max-distance-cells.
+
+Example:
+  python maze_benchmark.py --sizes 34x18,64x32,128x64,256x128 --gap-factor 0.6
+"""
+
+import argparse
+import random
+import time
+
+import contest.baseline_team as baseline_team
+import contest.capture as capture
+import contest.maze_generator as maze_generator
+from contest.layout import Layout, REGISTRY
+
+DEFAULT_SIZES = '34x18,64x32,128x64,256x128'
+
+
+def parse_sizes(sizes):
+    return [tuple(int(n) for n in size.split('x')) for size in sizes.split(',')]
+
+
+def initial_state(layout, length):
+    state = capture.GameState()
+    state.initialize(layout, 4)
+    state.data.timeleft = length
+    return state
+
+
+def time_successors(state, num_successors, rng):
+    """Returns the mean time of generate_successor along a random walk."""
+    agent_index = 0
+    elapsed = 0.0
+    for _ in range(num_successors):
+        action = rng.choice(state.get_legal_actions(agent_index))
+        start = time.perf_counter()
+        state = state.generate_successor(agent_index, action)
+        elapsed += time.perf_counter() - start
+        if state.is_over():
+            state = initial_state(state.data.layout, num_successors)
+        agent_index = (agent_index + 1) % state.get_num_agents()
+    return elapsed / num_successors
+
+
+def time_agent_moves(state, num_moves, seed):
+    """Returns the mean time the baseline agents take to observe and choose a move."""
+    agents = baseline_team.create_team(0, 2, True) + baseline_team.create_team(1, 3, False)
+    agents = [agents[0], agents[2], agents[1], agents[3]]
+    # The same streams as CaptureRules.new_game, so that the moves only depend on the seed
+    state = state.deep_copy()
+    state.rng = random.Random(f'{seed}/sonar')
+    for index, agent in enumerate(agents):
+        agent.rng = random.Random(f'{seed}/agent{index}')
+        agent.register_initial_state(state.deep_copy())
+    agent_index = 0
+    elapsed = 0.0
+    for _ in range(num_moves):
+        agent = agents[agent_index]
+        start = time.perf_counter()
+        observation = agent.observation_function(state.deep_copy())
+        action = agent.get_action(observation)
+        elapsed += time.perf_counter() - start
+        state = state.generate_successor(agent_index, action)
+        if state.is_over():
+            break
+        agent_index = (agent_index + 1) % len(agents)
+    return elapsed / num_moves
+
+
+def benchmark(width, height, options):
+    row = {'size': f'{width}x{height}'}
+
+    start = time.perf_counter()
+    maze = maze_generator.generate_maze(options.seed, width, height, food=options.food, capsules=options.capsules,
+                                        gaps=options.gaps, gap_factor=options.gap_factor)
+    row['generate'] = time.perf_counter() - start
+
+    layout = Layout(layout_name=f'RANDOM{options.seed}', layout_text=maze.split('\n'))
+    row['cells'] = len(layout.walls.as_list(False))
+    state = initial_state(layout, options.length)
+    row['successor'] = time_successors(state, options.successors, random.Random(options.seed))
+
+    row['distances'] = row['move'] = None
+    if row['cells'] <= options.max_distance_cells:
+        start = time.perf_counter()
+        layout.get_maze_distances()
+        row['distances'] = time.perf_counter() - start
+        # the agents find the distances computed above in the layout registry
+        row['move'] = time_agent_moves(state, options.moves, options.seed)
+        REGISTRY.clear()
+    return row
+
+
+def print_row(row):
+    def seconds(value, scale=1.0, unit='s'):
+        return 'skipped' if value is None else f'{value * scale:.3f}{unit}'
+
+    print(f"{row['size']:>9} {row['cells']:>7} {seconds(row['generate']):>10} {seconds(row['distances']):>11} "
+          f"{seconds(row['successor'], 1e6, 'us'):>12} {seconds(row['move'], 1e3, 'ms'):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweeps generated maze sizes against the cost of the engine '
+                                                 'and the baseline agents.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma separated WIDTHxHEIGHT maze sizes '
+                                                               f'[Default: {DEFAULT_SIZES}]')
+    parser.add_argument('--seed', type=int, default=1, help='Maze and agent seed [Default: 1]')
+    parser.add_argument('--food', type=int, default=None, help='Total food [Default: one per ten cells]')
+    parser.add_argument('--capsules', type=int, default=4, help='Total capsules [Default: 4]')
+    parser.add_argument('--gaps', type=int, default=3, help='Gaps in the first wall [Default: 3]')
+    parser.add_argument('--gap-factor', dest='gap_factor', type=float, default=None,
+                        help='How the gaps of nested walls shrink; higher means more open mazes [Default: random]')
+    parser.add_argument('--length', type=int, default=1200, help='Game length in moves [Default: 1200]')
+    parser.add_argument('--successors', type=int, default=2000, help='Successors to time per size [Default: 2000]')
+    parser.add_argument('--moves', type=int, default=40, help='Agent moves to time per size [Default: 40]')
+    parser.add_argument('--max-distance-cells', dest='max_distance_cells', type=int, default=1500,
+                        help='Skip the distances and the agents above this many open cells [Default: 1500]')
+    options = parser.parse_args()
+
+    print(f"{'size':>9} {'cells':>7} {'generate':>10} {'distances':>11} {'successor':>12} {'agent move':>12}")
+    for width, height in parse_sizes(options.sizes):
+        print_row(benchmark(width, height, options))
+
+
+if __name__ == '__main__':
+    main()
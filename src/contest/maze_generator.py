@@ -12,7 +12,8 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import random, sys
+import os, random, sys
+from collections import OrderedDict
 
 """
 maze generator code
@@ -29,6 +30,11 @@ food is placed in dead ends and then randomly (though not too close to the pacma
 notes:
 the final map includes a symmetric, flipped copy
 the first wall has k gaps, the next wall has k/2 gaps, etc. (min=1)
+every maze draws from its own random.Random, so generating one never
+touches the global random module and a seed always gives the same maze
+
+generated mazes are cached by seed, in memory and (for the mazes written
+by cache_mazes) on disk, so RANDOM<seed> layouts are only generated once
 
 @author: Dan Gillick
 @author: Jie Tang
@@ -41,10 +47,11 @@ E = ' '
 
 class Maze:
 
-  def __init__(self, rows, cols, anchor=(0, 0), root=None):
+  def __init__(self, rows, cols, anchor=(0, 0), root=None, rng=None):
     """
     generate an empty maze
     anchor is the top left corner of this grid's position in its parent grid
+    rng is the random.Random the maze is built with (sub-rooms share the root's)
     """
     self.r = rows
     self.c = cols
@@ -53,6 +60,7 @@ class Maze:
     self.rooms = []
     self.root = root
     if not self.root: self.root = self
+    self.rng = self.root.rng if root else (rng or random.Random())
 
   def to_map(self):
     """
@@ -75,12 +83,7 @@ class Maze:
     self.r += 2
 
   def __str__(self):
-    s = ''
-    for row in range(self.r):
-      for col in range(self.c):
-        s += self.grid[row][col]
-      s += '\n'
-    return s[:-1]
+    return '\n'.join(''.join(self.grid[row][:self.c]) for row in range(self.r))
 
   def add_wall(self, i, gaps=1, vert=True):
     """
@@ -93,10 +96,10 @@ class Maze:
       if not 0 in slots:
         if self.root.grid[min(slots)-1][add_c+i] == E: slots.remove(min(slots))
         if len(slots) <= gaps: return 0
-      if not self.root.c-1 in slots:
+      if not self.root.r-1 in slots:
         if self.root.grid[max(slots)+1][add_c+i] == E: slots.remove(max(slots))
       if len(slots) <= gaps: return 0
-      random.shuffle(slots)
+      self.root.rng.shuffle(slots)
       for row in slots[int(round(gaps)):]:
         self.root.grid[row][add_c+i] = W
       self.rooms.append(Maze(self.r, i, (add_r,add_c), self.root))
@@ -107,10 +110,10 @@ class Maze:
       if not 0 in slots:
         if self.root.grid[add_r+i][min(slots)-1] == E: slots.remove(min(slots))
         if len(slots) <= gaps: return 0
-      if not self.root.r-1 in slots:
+      if not self.root.c-1 in slots:
         if self.root.grid[add_r+i][max(slots)+1] == E: slots.remove(max(slots))
       if len(slots) <= gaps: return 0
-      random.shuffle(slots)
+      self.root.rng.shuffle(slots)
       for col in slots[int(round(gaps)):]:
         self.root.grid[add_r+i][col] = W
       self.rooms.append(Maze(i, self.c, (add_r,add_c), self.root))
@@ -123,7 +126,7 @@ def make_with_prison(room, depth, gaps=1, vert=True, min_width=1, gap_factor=0.5
   Build a maze with 0,1,2 layers of prison (randomly)
   """
   # p = random.randint(0,2)
-  p_roll = random.random()
+  p_roll = room.root.rng.random()
   if p_roll < 0.5:
     p = 1
   elif p_roll < 0.7:
@@ -135,7 +138,6 @@ def make_with_prison(room, depth, gaps=1, vert=True, min_width=1, gap_factor=0.5
 
 
   add_r, add_c = room.anchor
-  print(p)
   for j in range(p):
     cur_col = 2*(j+1)-1
     for row in range(room.r):
@@ -172,7 +174,7 @@ def make(room, depth, gaps=1, vert=True, min_width=1, gap_factor=0.5):
   if depth==0: wall_slots = [num-2]  ## fix the first wall
   else: wall_slots = range(1, num-1)
   if len(wall_slots) == 0: return
-  choice = random.choice(wall_slots)
+  choice = room.root.rng.choice(wall_slots)
   if not room.add_wall(choice, gaps, vert): return
 
   ## recursively add walls
@@ -230,8 +232,8 @@ def add_pacman_stuff(maze, max_food=60, max_capsules=4, to_skip=0):
   ## add capsules
   total_capsules = 0
   while total_capsules < max_capsules:
-    row = random.randint(1, maze.r-1)
-    col = random.randint(1 + to_skip, (maze.c // 2) - 2)
+    row = maze.rng.randint(1, maze.r-1)
+    col = maze.rng.randint(1 + to_skip, (maze.c // 2) - 2)
     if (row > maze.r-6) and (col < 6): continue
     if abs(col - maze.c / 2) < 3: continue
     if maze.grid[row][col] == E:
@@ -240,9 +242,17 @@ def add_pacman_stuff(maze, max_food=60, max_capsules=4, to_skip=0):
       total_capsules += 2
 
   ## extra random food
+  free_cells = 0
+  for row in range(1, maze.r):
+    for col in range(1 + to_skip, maze.c // 2):
+      if (row > maze.r-6) and (col < 6): continue
+      if abs(col - maze.c // 2) < 3: continue
+      if maze.grid[row][col] == E: free_cells += 1
+  if 2 * free_cells < max_food - total_food:
+    raise Exception('Not enough room for %d food in a %dx%d maze' % (max_food, maze.c, maze.r))
   while total_food < max_food:
-    row = random.randint(1, maze.r-1)
-    col = random.randint(1 + to_skip, (maze.c // 2) - 1)
+    row = maze.rng.randint(1, maze.r-1)
+    col = maze.rng.randint(1 + to_skip, (maze.c // 2) - 1)
     if (row > maze.r-6) and (col < 6): continue
     if abs(col - maze.c // 2) < 3: continue
     if maze.grid[row][col] == E:
@@ -252,17 +262,138 @@ def add_pacman_stuff(maze, max_food=60, max_capsules=4, to_skip=0):
 
 MAX_DIFFERENT_MAZES = 10000
 
-def generate_maze(seed = None):
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts', 'random')
+
+# Mazes kept in memory by get_maze, the least recently used are dropped first
+MAX_CACHED_MAZES = 64
+
+_maze_cache = OrderedDict()
+
+def generate_maze(seed = None, width=34, height=18, food=None, capsules=4, gaps=3, gap_factor=None):
+  """
+  generate a capture maze of width x height cells, border included
+
+  the width must be even, as the right half mirrors the left one
+  food and capsules are totals for the whole maze; by default there is one
+  food for every ten cells (60 in the default 34x18 maze)
+  gaps is the number of gaps of the first wall and gap_factor how fast the
+  gaps of the nested walls shrink (drawn at random by default): more and
+  slower-shrinking gaps give an open maze, fewer give long corridors
+  """
+  if width % 2 != 0 or width < 16 or height < 8:
+    raise Exception('Cannot generate a %dx%d maze: the width must be even and at least 16x8' % (width, height))
   if not seed:
     seed = random.randint(1,MAX_DIFFERENT_MAZES)
-  random.seed(seed)
-  maze = Maze(16,16)
-  gap_factor = min(0.65,random.gauss(0.5,0.1))
-  skip = make_with_prison(maze, depth=0, gaps=3, vert=True, min_width=1, gap_factor=gap_factor)
+  rng = random.Random(seed)
+  maze = Maze(height - 2, width // 2 - 1, rng=rng)
+  if gap_factor is None:
+    gap_factor = min(0.65,rng.gauss(0.5,0.1))
+  skip = make_with_prison(maze, depth=0, gaps=gaps, vert=True, min_width=1, gap_factor=gap_factor)
   maze.to_map()
-  add_pacman_stuff(maze, 2*(maze.r*maze.c//20), 4, skip)
+  if food is None:
+    food = 2*(maze.r*maze.c//20)
+  add_pacman_stuff(maze, food, capsules, skip)
   return str(maze)
 
+def validate_maze(maze_str, min_food=2):
+  """
+  check that a generated maze is playable
+  returns a list of problems; the maze is valid when it is empty
+  """
+  rows = maze_str.split('\n')
+  problems = []
+  if len(set(len(row) for row in rows)) != 1:
+    return ['rows have different lengths']
+  r, c = len(rows), len(rows[0])
+  if any(ch != W for ch in rows[0] + rows[-1]) or any(row[0] != W or row[-1] != W for row in rows):
+    problems.append('maze is not closed by a border of walls')
+
+  ## every open cell must be reachable from every other one
+  open_cells = set((row, col) for row in range(r) for col in range(c) if rows[row][col] != W)
+  if open_cells:
+    start = next(iter(open_cells))
+    reached, frontier = set([start]), [start]
+    while frontier:
+      row, col = frontier.pop()
+      for n in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+        if n in open_cells and n not in reached:
+          reached.add(n)
+          frontier.append(n)
+    if len(reached) != len(open_cells):
+      problems.append('%d open cells are unreachable' % (len(open_cells) - len(reached)))
+
+  ## both teams need the same amount of food, capsules and agents
+  for item, name in ((F, 'food'), (C, 'capsules')):
+    left = sum(row[:c // 2].count(item) for row in rows)
+    right = sum(row[c // 2:].count(item) for row in rows)
+    if left != right:
+      problems.append('unbalanced %s: %d on the left, %d on the right' % (name, left, right))
+    elif item == F and left <= min_food:
+      problems.append('only %d food per side' % left)
+  for agent in '1234':
+    if maze_str.count(agent) != 1:
+      problems.append('agent %s is placed %d times' % (agent, maze_str.count(agent)))
+  return problems
+
+def cache_path(seed, cache_dir=CACHE_DIR):
+  return os.path.join(cache_dir, 'random%08dCapture.lay' % seed)
+
+def get_maze(seed, cache_dir=CACHE_DIR):
+  """
+  returns the maze for a seed, from the in-memory cache (the last
+  MAX_CACHED_MAZES used), then the disk cache (see cache_mazes), and only
+  generates it when it is in neither
+  """
+  if seed in _maze_cache:
+    _maze_cache.move_to_end(seed)
+    return _maze_cache[seed]
+  path = cache_path(seed, cache_dir)
+  if os.path.exists(path):
+    with open(path) as f:
+      maze = f.read()
+  else:
+    maze = generate_maze(seed)
+  _maze_cache[seed] = maze
+  while len(_maze_cache) > MAX_CACHED_MAZES:
+    _maze_cache.popitem(last=False)
+  return maze
+
+def _generate_and_validate(seed):
+  maze = generate_maze(seed)
+  return seed, maze, validate_maze(maze)
+
+def generate_mazes(seeds, processes=None, chunksize=16):
+  """
+  generates the mazes of many seeds on a process pool
+  yields (seed, maze, problems) tuples in the order of seeds
+  """
+  seeds = list(seeds)
+  if processes == 1 or len(seeds) <= chunksize:
+    for seed in seeds:
+      yield _generate_and_validate(seed)
+    return
+  import multiprocessing
+  with multiprocessing.Pool(processes) as pool:
+    for result in pool.imap(_generate_and_validate, seeds, chunksize):
+      yield result
+
+def cache_mazes(seeds, cache_dir=CACHE_DIR, processes=None):
+  """
+  generates, validates and writes the mazes of many seeds into the disk cache,
+  skipping the seeds that are already there
+  returns the list of (seed, problems) of the mazes that failed validation
+  """
+  os.makedirs(cache_dir, exist_ok=True)
+  missing = [seed for seed in seeds if not os.path.exists(cache_path(seed, cache_dir))]
+  invalid = []
+  for seed, maze, problems in generate_mazes(missing, processes):
+    if problems:
+      invalid.append((seed, problems))
+      continue
+    with open(cache_path(seed, cache_dir), 'w') as out:
+      out.write(maze)
+  return invalid
+
 if __name__ == '__main__':
   seed = None
   if len(sys.argv) > 1:
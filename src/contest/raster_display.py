@@ -0,0 +1,592 @@
+# raster_display.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Headless rendering of games into images, without Tk or an X display.
+
+RasterGraphics is a display, like capture_graphics_display.PacmanGraphics,
+that draws every frame (walls, food, capsules, agents and the score pane)
+into a NumPy array of palette indices and hands it as an RGB array of shape
+(height, width, 3) to a sink: any callable, such as list.append, a PngWriter
+(one PNG file per frame) or a GifWriter (an animated GIF). Both writers only
+need the standard library.
+
+Replays recorded with --record are re-simulated with capture.replay_game,
+and many of them can be rendered in parallel on a process pool:
+
+  python raster_display.py www/contest_default/replays/*.replay --out highlights
+  python raster_display.py match_0.replay --format png --cell-size 20 --every 4
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import pickle
+import struct
+import zlib
+
+import numpy as np
+
+import contest.capture as capture
+import contest.layout
+from contest.game import Directions
+
+CELL_SIZE = 12  # pixels per cell of the layout
+FRAME_DELAY = 0.04  # seconds per frame of the GIFs
+
+# The colours of capture_graphics_display, which imports Tk, as palette indices
+BACKGROUND, RED, BLUE, ORANGE, TEAL, WHITE, TEXT, TRANSPARENT = range(8)
+PALETTE = np.array([(0, 0, 0), (229, 0, 0), (0, 76, 229), (249, 104, 17), (25, 191, 178), (255, 255, 255),
+                    (229, 229, 229), (0, 0, 0)], dtype=np.uint8)
+TEAM_COLORS = [RED, BLUE]
+AGENT_COLORS = [RED, BLUE, ORANGE, TEAL]
+
+GHOST_SHAPE = [(0, 0.3), (0.25, 0.75), (0.5, 0.3), (0.75, 0.75), (0.75, -0.5), (0.5, -0.75), (-0.5, -0.75),
+               (-0.75, -0.5), (-0.75, 0.75), (-0.5, 0.3), (-0.25, 0.75)]
+GHOST_SIZE = 0.65
+PACMAN_SCALE = 0.5
+FOOD_SIZE = 0.1
+CAPSULE_SIZE = 0.25
+WALL_WIDTH = 0.25
+
+# Screen vectors (y grows downwards) of the directions agents face
+DIRECTION_VECTORS = {Directions.NORTH: (0, -1), Directions.SOUTH: (0, 1), Directions.EAST: (1, 0),
+                     Directions.WEST: (-1, 0), Directions.STOP: (1, 0)}
+
+# 3x5 pixel font of the score pane; lower case letters are drawn as upper case
+FONT = {
+    'A': '010 101 111 101 101', 'B': '110 101 110 101 110', 'C': '011 100 100 100 011',
+    'D': '110 101 101 101 110', 'E': '111 100 110 100 111', 'F': '111 100 110 100 100',
+    'G': '011 100 101 101 011', 'H': '101 101 111 101 101', 'I': '111 010 010 010 111',
+    'J': '001 001 001 101 010', 'K': '101 101 110 101 101', 'L': '100 100 100 100 111',
+    'M': '101 111 111 101 101', 'N': '110 101 101 101 101', 'O': '010 101 101 101 010',
+    'P': '110 101 110 100 100', 'Q': '010 101 101 110 011', 'R': '110 101 110 101 101',
+    'S': '011 100 010 001 110', 'T': '111 010 010 010 010', 'U': '101 101 101 101 111',
+    'V': '101 101 101 101 010', 'W': '101 101 111 111 101', 'X': '101 101 010 101 101',
+    'Y': '101 101 010 010 010', 'Z': '111 001 010 100 111', '0': '111 101 101 101 111',
+    '1': '010 110 010 010 111', '2': '110 001 010 100 111', '3': '110 001 010 001 110',
+    '4': '101 101 111 001 001', '5': '111 100 110 001 110', '6': '011 100 111 101 111',
+    '7': '111 001 010 010 010', '8': '111 101 111 101 111', '9': '111 101 111 001 110',
+    '-': '000 000 111 000 000', ':': '000 010 000 010 000', '.': '000 000 000 000 010',
+    '_': '000 000 000 000 111', '!': '010 010 010 000 010', '?': '110 001 010 000 010',
+}
+
+
+###########
+# Sprites #
+###########
+
+def _cell_coordinates(cell_size):
+    """Returns the coordinates of the pixel centres of a cell, in cells from its centre"""
+    u = (np.arange(cell_size) + 0.5) / cell_size - 0.5
+    return u[None, :], u[:, None]  # x grows rightwards, y downwards
+
+
+def disc_mask(cell_size, radius, center=(0.0, 0.0)):
+    xs, ys = _cell_coordinates(cell_size)
+    radius = max(radius, 0.6 / cell_size)  # at least the nearest pixel
+    return (xs - center[0]) ** 2 + (ys - center[1]) ** 2 <= radius ** 2
+
+
+def polygon_mask(cell_size, points):
+    """Even-odd rule over the pixel centres"""
+    xs, ys = _cell_coordinates(cell_size)
+    inside = np.zeros((cell_size, cell_size), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+        if y1 == y2: continue
+        crosses = (ys < y1) != (ys < y2)
+        x_cross = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (xs < x_cross)
+    return inside
+
+
+class Sprite:
+    """The pixels of a cell covered by a drawing (mask) and their colours (values)."""
+
+    def __init__(self, mask, values):
+        self.mask = mask
+        self.values = values
+
+    def paint(self, image, row, col):
+        block = image[row:row + self.mask.shape[0], col:col + self.mask.shape[1]]
+        if block.shape == self.mask.shape:
+            block[self.mask] = self.values[self.mask]
+
+
+_sprites = {}
+
+
+def get_sprite(kind, cell_size, color, direction=Directions.STOP):
+    """Returns a cached Sprite: 'food', 'capsule', 'pacman' or 'ghost'"""
+    key = (kind, cell_size, color, direction)
+    if key not in _sprites:
+        values = np.full((cell_size, cell_size), color, dtype=np.uint8)
+        if kind == 'food':
+            mask = disc_mask(cell_size, FOOD_SIZE)
+        elif kind == 'capsule':
+            mask = disc_mask(cell_size, CAPSULE_SIZE)
+        elif kind == 'pacman':
+            # A disc with a 60 degrees mouth facing the direction
+            xs, ys = _cell_coordinates(cell_size)
+            dx, dy = DIRECTION_VECTORS.get(direction, (1, 0))
+            norm = np.sqrt(xs ** 2 + ys ** 2) + 1e-9
+            mouth = (xs * dx + ys * dy) / norm > np.cos(np.pi / 6)
+            mask = disc_mask(cell_size, PACMAN_SCALE) & ~mouth
+        elif kind == 'ghost':
+            dx, dy = [0.2 * v for v in DIRECTION_VECTORS.get(direction, (0, 0))]
+            if direction == Directions.STOP: dx = dy = 0
+            mask = polygon_mask(cell_size, [(x * GHOST_SIZE, y * GHOST_SIZE) for x, y in GHOST_SHAPE])
+            for side in (-0.3, 0.3):
+                eye = disc_mask(cell_size, 0.2 * GHOST_SIZE,
+                                ((side + dx / 1.5) * GHOST_SIZE, (-0.3 + dy / 1.5) * GHOST_SIZE))
+                pupil = disc_mask(cell_size, 0.08 * GHOST_SIZE, ((side + dx) * GHOST_SIZE, (-0.3 + dy) * GHOST_SIZE))
+                values[eye] = WHITE
+                values[pupil] = BACKGROUND
+                mask |= eye
+        else:
+            raise Exception('Unknown sprite %s' % kind)
+        _sprites[key] = Sprite(mask, values)
+    return _sprites[key]
+
+
+_glyphs = {}
+
+
+def get_glyph(char, scale):
+    key = (char, scale)
+    if key not in _glyphs:
+        rows = FONT.get(char.upper(), '000 000 000 000 000').split()
+        bits = np.array([[bit == '1' for bit in row] for row in rows])
+        _glyphs[key] = np.kron(bits, np.ones((scale, scale), dtype=bool)).astype(bool)
+    return _glyphs[key]
+
+
+def draw_text(image, col, row, text, color, scale):
+    """Draws text in the 3x5 font, clipped to the image"""
+    for char in text:
+        glyph = get_glyph(char, scale)
+        block = image[row:row + glyph.shape[0], col:col + glyph.shape[1]]
+        block[glyph[:block.shape[0], :block.shape[1]]] = color
+        col += 4 * scale
+
+
+def draw_background(layout, cell_size):
+    """
+    Returns the walls of the layout in an array of palette indices, with room
+    for the score pane below. Each wall cell is a bar from its centre towards
+    every neighbouring wall, coloured by the side of the board.
+    """
+    width, height = layout.width, layout.height
+    pane_height = 9 * pane_scale(cell_size)
+    image = np.full((height * cell_size + pane_height, width * cell_size), BACKGROUND, dtype=np.uint8)
+    walls = layout.walls
+    thickness = max(2, int(round(cell_size * WALL_WIDTH)))
+    low = (cell_size - thickness) // 2
+    high = low + thickness
+    for x in range(width):
+        color = TEAM_COLORS[0] if x * 2 < width else TEAM_COLORS[1]
+        for y in range(height):
+            if not walls[x][y]: continue
+            block = image[(height - 1 - y) * cell_size:(height - y) * cell_size, x * cell_size:(x + 1) * cell_size]
+            block[low:high, low:high] = color
+            if x > 0 and walls[x - 1][y]: block[low:high, :high] = color
+            if x < width - 1 and walls[x + 1][y]: block[low:high, low:] = color
+            if y < height - 1 and walls[x][y + 1]: block[:high, low:high] = color
+            if y > 0 and walls[x][y - 1]: block[low:, low:high] = color
+    return image
+
+
+def pane_scale(cell_size):
+    return max(1, cell_size // 6)
+
+
+##############
+#  Display   #
+##############
+
+class RasterGraphics:
+    """
+    A display that draws the game into arrays instead of a Tk window. The
+    board (walls, food and capsules) is kept between frames and only the
+    cells that change are redrawn; the agents and the score pane are drawn
+    on a copy of it for every frame.
+
+    sink receives the RGB array of every frame_every-th move, plus the
+    first and last frames.
+    """
+
+    def __init__(self, red_team='Red', blue_team='Blue', cell_size=CELL_SIZE, sink=None, frame_every=1):
+        self.red_team = red_team
+        self.blue_team = blue_team
+        self.cell_size = cell_size
+        self.sink = sink
+        self.frame_every = frame_every
+        self.num_frames = 0
+
+    def initialize(self, state, is_blue=False):
+        self.layout = state.layout
+        self.width, self.height = self.layout.width, self.layout.height
+        cell_size = self.cell_size
+        background = contest.layout.REGISTRY.get_derived(self.layout, ('raster_background', cell_size),
+                                                         lambda layout: draw_background(layout, cell_size))
+        self.board = background.copy()
+        for x in range(self.width):
+            for y in range(self.height):
+                if state.food[x][y]: self.draw_food((x, y))
+        for capsule in state.capsules:
+            self.paint_cell('capsule', WHITE, capsule)
+        self.agents = list(state.agent_states)
+        self.score, self.timeleft = state.score, state.timeleft
+        self.num_moves = 0
+        self.num_frames = 0
+        self.emit()
+
+    def update(self, new_state):
+        if new_state._food_eaten is not None:
+            self.clear_cell(new_state._food_eaten)
+        if new_state._food_added is not None:
+            for pos in new_state._food_added:
+                self.draw_food(pos)
+        if new_state._capsule_eaten is not None:
+            self.clear_cell(new_state._capsule_eaten)
+        # Every agent, since a move can also eat or scare the others
+        self.agents = list(new_state.agent_states)
+        self.score, self.timeleft = new_state.score, new_state.timeleft
+        self.num_moves += 1
+        if self.num_moves % self.frame_every == 0:
+            self.emit()
+
+    def finish(self):
+        if self.num_moves % self.frame_every != 0:
+            self.emit()
+
+    def emit(self):
+        if self.sink is not None:
+            self.sink(self.get_frame())
+        self.num_frames += 1
+
+    def get_frame(self):
+        """Returns the current frame as an RGB array"""
+        return PALETTE[self.render()]
+
+    def render(self):
+        """Returns the current frame as an array of palette indices"""
+        image = self.board.copy()
+        for index, agent in enumerate(self.agents):
+            if agent.configuration is None: continue
+            direction = agent.configuration.get_direction()
+            if agent.is_pacman:
+                sprite = get_sprite('pacman', self.cell_size, AGENT_COLORS[index % 4], direction)
+            else:
+                color = WHITE if agent.scared_timer > 0 else AGENT_COLORS[index % 4]
+                sprite = get_sprite('ghost', self.cell_size, color, direction)
+            self.paint(sprite, agent.get_position(), image)
+        self.draw_pane(image)
+        return image
+
+    def draw_pane(self, image):
+        scale = pane_scale(self.cell_size)
+        row = self.height * self.cell_size + 2 * scale
+        width = image.shape[1]
+        draw_text(image, scale, row, 'SCORE: %2d' % self.score, TEXT, scale)
+        # The team names on both sides of a 'VS' a bit left of the middle
+        vs_col = int(0.475 * width)
+        red_name = str(self.red_team)[:12]
+        draw_text(image, vs_col - 4 * scale * (len(red_name) + 1), row, red_name, TEAM_COLORS[0], scale)
+        draw_text(image, vs_col, row, 'VS', TEXT, scale)
+        draw_text(image, vs_col + 4 * scale * 3, row, str(self.blue_team)[:12], TEAM_COLORS[1], scale)
+        if self.timeleft is not None:
+            time_string = 'TIME: %4d' % self.timeleft
+            draw_text(image, width - 4 * scale * len(time_string), row, time_string, TEXT, scale)
+
+    def to_screen(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        return (self.height - 1 - y) * self.cell_size, x * self.cell_size
+
+    def paint(self, sprite, pos, image):
+        row, col = self.to_screen(pos)
+        sprite.paint(image, row, col)
+
+    def paint_cell(self, kind, color, pos):
+        self.paint(get_sprite(kind, self.cell_size, color), pos, self.board)
+
+    def draw_food(self, pos):
+        self.paint_cell('food', TEAM_COLORS[0] if pos[0] * 2 < self.width else TEAM_COLORS[1], pos)
+
+    def clear_cell(self, pos):
+        row, col = self.to_screen(pos)
+        self.board[row:row + self.cell_size, col:col + self.cell_size] = BACKGROUND
+
+
+###########
+# Writers #
+###########
+
+def write_png(path, rgb):
+    """Writes an RGB array as an 8-bit PNG file"""
+    height, width, _ = rgb.shape
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # every row starts with filter 0 (none)
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+class PngWriter:
+    """A sink writing every frame to directory/prefix_00000001.png, ..."""
+
+    def __init__(self, directory, prefix='frame'):
+        self.directory = directory
+        self.prefix = prefix
+        self.num_frames = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, rgb):
+        write_png(os.path.join(self.directory, '%s_%08d.png' % (self.prefix, self.num_frames)), rgb)
+        self.num_frames += 1
+
+    def close(self):
+        pass
+
+
+def to_palette_indices(rgb, palette=PALETTE):
+    """Maps every pixel of an RGB array to the nearest colour of the palette"""
+    codes = (rgb[..., 0].astype(np.int32) << 16) | (rgb[..., 1].astype(np.int32) << 8) | rgb[..., 2]
+    palette_codes = (palette[:, 0].astype(np.int32) << 16) | (palette[:, 1].astype(np.int32) << 8) | palette[:, 2]
+    indices = np.zeros(codes.shape, dtype=np.uint8)
+    matched = np.zeros(codes.shape, dtype=bool)
+    for index in range(len(palette) - 1, -1, -1):  # the first of repeated colours wins
+        exact = codes == palette_codes[index]
+        indices[exact] = index
+        matched |= exact
+    if not matched.all():
+        colors, inverse = np.unique(codes[~matched], return_inverse=True)
+        components = np.stack([colors >> 16, (colors >> 8) & 0xff, colors & 0xff], axis=1)
+        distances = ((components[:, None, :] - palette[None, :, :].astype(np.int32)) ** 2).sum(axis=2)
+        indices[~matched] = np.argmin(distances, axis=1)[inverse]
+    return indices
+
+
+def lzw_encode(indices, min_code_size):
+    """Returns the variable-length LZW codes of a sequence of palette indices, as GIF data bytes"""
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    out = bytearray()
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    table = {}
+    table_get = table.get
+
+    # Codes are packed least significant bit first, and written 64 bits at a time
+    bits = clear_code
+    num_bits = code_size
+    prefix = indices[0]
+    for index in indices[1:]:
+        key = (prefix << 8) | index
+        code = table_get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << num_bits
+        num_bits += code_size
+        if num_bits >= 64:
+            out += (bits & 0xffffffffffffffff).to_bytes(8, 'little')
+            bits >>= 64
+            num_bits -= 64
+        # The decoder adds its entry one code later, and widens its codes once that entry fills them
+        if next_code == 1 << code_size and code_size < 12:
+            code_size += 1
+        table[key] = next_code
+        next_code += 1
+        if next_code == 4096:
+            bits |= clear_code << num_bits
+            num_bits += code_size
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end_code + 1
+        prefix = index
+    for code in (prefix, end_code):
+        bits |= code << num_bits
+        num_bits += code_size
+        if next_code == 1 << code_size and code_size < 12:
+            code_size += 1
+    out += bits.to_bytes((num_bits + 7) // 8, 'little')
+    return bytes(out)
+
+
+class GifWriter:
+    """
+    A sink writing the frames to an animated GIF, looping forever. Only the
+    rectangle that changed since the previous frame is encoded, with the
+    unchanged pixels in it left transparent.
+    """
+
+    def __init__(self, path, delay=FRAME_DELAY, palette=PALETTE):
+        self.path = path
+        self.delay = int(round(delay * 100))  # in hundredths of a second
+        self.palette = palette
+        self.file = None
+        self.previous = None
+        self.num_frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __call__(self, rgb):
+        indices = to_palette_indices(rgb, self.palette)
+        if self.file is None:
+            self.start(indices.shape)
+            top, left, block = 0, 0, indices
+        else:
+            changed = indices != self.previous
+            rows, cols = np.nonzero(changed.any(axis=1))[0], np.nonzero(changed.any(axis=0))[0]
+            if len(rows) == 0:
+                rows = cols = np.array([0])
+            top, left = int(rows[0]), int(cols[0])
+            block = indices[top:rows[-1] + 1, left:cols[-1] + 1].copy()
+            block[~changed[top:rows[-1] + 1, left:cols[-1] + 1]] = TRANSPARENT
+        self.previous = indices
+        self.write_image(block, top, left)
+        self.num_frames += 1
+
+    def start(self, shape):
+        self.height, self.width = shape
+        self.table_bits = max(2, int(np.ceil(np.log2(len(self.palette)))))
+        table = np.zeros((1 << self.table_bits, 3), dtype=np.uint8)
+        table[:len(self.palette)] = self.palette
+        self.file = open(self.path, 'wb')
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', self.width, self.height, 0xf0 | (self.table_bits - 1), 0, 0))
+        self.file.write(table.tobytes())
+        # Loop forever
+        self.file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def write_image(self, block, top, left):
+        height, width = block.shape
+        # Graphic control: keep the previous frame below this one, transparent index, delay
+        self.file.write(b'!\xf9\x04' + struct.pack('<BHBB', (1 << 2) | 1, self.delay, TRANSPARENT, 0))
+        self.file.write(b',' + struct.pack('<HHHHB', left, top, width, height, 0))
+        data = lzw_encode(block.ravel().tolist(), self.table_bits)
+        self.file.write(bytes([self.table_bits]))
+        for start in range(0, len(data), 255):
+            sub_block = data[start:start + 255]
+            self.file.write(bytes([len(sub_block)]) + sub_block)
+        self.file.write(b'\x00')
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(b';')
+            self.file.close()
+            self.file = None
+
+
+#############
+#  Replays  #
+#############
+
+def load_replay(path):
+    """Loads a replay written by capture.run_games with --record"""
+    with open(path, 'rb') as f:
+        return pickle.load(f, encoding="utf-8")
+
+
+def render_replay(replay, sink, cell_size=CELL_SIZE, frame_every=1):
+    """
+    Re-simulates a replay (a path or a loaded replay) and draws its frames
+    into sink. Returns the number of frames.
+    """
+    if isinstance(replay, str):
+        replay = load_replay(replay)
+    display = RasterGraphics(cell_size=cell_size, sink=sink, frame_every=frame_every)
+    with contextlib.redirect_stdout(io.StringIO()):
+        capture.replay_game(replay['layout'], replay['agents'], replay['actions'], display, replay['length'],
+                            replay.get('red_team_name', 'Red'), replay.get('blue_team_name', 'Blue'),
+                            wait_end=False, delay=0)
+    return display.num_frames
+
+
+def render_replay_file(path, out_dir, image_format='gif', cell_size=CELL_SIZE, frame_every=1, delay=FRAME_DELAY):
+    """
+    Renders a replay file to out_dir/<name>.gif, or to PNGs in the directory
+    out_dir/<name>. Returns (path, output, number of frames).
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if image_format == 'gif':
+        os.makedirs(out_dir, exist_ok=True)
+        output = os.path.join(out_dir, name + '.gif')
+        writer = GifWriter(output, delay)
+    elif image_format == 'png':
+        output = os.path.join(out_dir, name)
+        writer = PngWriter(output)
+    else:
+        raise Exception('Unknown image format %s' % image_format)
+    try:
+        num_frames = render_replay(path, writer, cell_size, frame_every)
+    finally:
+        writer.close()
+    return path, output, num_frames
+
+
+def _render_replay_file(args):
+    return render_replay_file(*args)
+
+
+def render_replays(paths, out_dir, image_format='gif', cell_size=CELL_SIZE, frame_every=1, delay=FRAME_DELAY,
+                   processes=None):
+    """
+    Renders many replay files on a process pool (see render_replay_file);
+    yields the (path, output, number of frames) of each as it finishes
+    """
+    tasks = [(path, out_dir, image_format, cell_size, frame_every, delay) for path in paths]
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _render_replay_file(task)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(_render_replay_file, tasks):
+            yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Renders recorded games to animated GIFs or PNG frames, without Tk')
+    parser.add_argument('replays', nargs='+', help='replay files written with --record')
+    parser.add_argument('--out', default='frames', help='output directory (default: %(default)s)')
+    parser.add_argument('--format', dest='image_format', choices=['gif', 'png'], default='gif',
+                        help='an animated GIF per replay, or a directory of PNG frames (default: %(default)s)')
+    parser.add_argument('--cell-size', type=int, default=CELL_SIZE,
+                        help='pixels per cell of the layout (default: %(default)s)')
+    parser.add_argument('--every', type=int, default=1, help='draw a frame every this many moves (default: %(default)s)')
+    parser.add_argument('--delay', type=float, default=FRAME_DELAY,
+                        help='seconds per frame of the GIFs (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='processes rendering replays in parallel (default: one per CPU)')
+    args = parser.parse_args()
+
+    for path, output, num_frames in render_replays(args.replays, args.out, args.image_format, args.cell_size,
+                                                   args.every, args.delay, args.processes):
+        print('%s: %d frames written to %s' % (path, num_frames, output))
+
+
+if __name__ == '__main__':
+    main()
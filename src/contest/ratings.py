@@ -0,0 +1,229 @@
+# ratings.py
+# ----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Skill ratings of the teams, updated one game at a time.
+
+Every team has a Gaussian belief about its skill, a mean mu and a standard
+deviation sigma, updated after each game with the two player TrueSkill
+rules (draws included). Unlike the points of a round robin, the ratings do
+not need every pair of teams to play: sigma tells how much is still unknown
+about a team, and the ranking is settled once every team is ahead of the
+next one with the given confidence, or both are known within MAX_SIGMA
+(teams of about the same skill would otherwise never be settled). Until
+then, suggest_matches picks the most informative games to play, between
+the teams whose order is unsure.
+
+Games are the tuples of capture.get_games_data, so the ratings can be fed
+from the results store (results.ResultStore.get_results) or from the
+match_<id>.json files of capture.save_score.
+
+Example:
+  python ratings.py --db www/contest_default/results.db --confidence 0.9
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+from statistics import NormalDist
+
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2  # skill difference giving the better team about 76% chances of winning
+TAU = SIGMA / 100  # drift of the skills between games, keeps sigma from vanishing
+DRAW_PROBABILITY = 0.1  # ties are common, e.g. between two defensive teams
+CONFIDENCE = 0.9
+MAX_SIGMA = BETA / 3  # teams known this well are not told apart by more games
+
+NORMAL = NormalDist()
+
+
+def _truncated_win(t, e):
+    """(v, w) corrections of a win by a margin of t, draws being within e (standardized)"""
+    denominator = NORMAL.cdf(t - e)
+    if denominator < 1e-300:
+        v = e - t  # limit of the ratio for very unlikely wins
+    else:
+        v = NORMAL.pdf(t - e) / denominator
+    return v, v * (v + t - e)
+
+
+def _truncated_draw(t, e):
+    """(v, w) corrections of a draw when the first team was ahead by t (standardized)"""
+    denominator = NORMAL.cdf(e - t) - NORMAL.cdf(-e - t)
+    if denominator < 1e-300:
+        return (e - t if t > 0 else -e - t), 1.0
+    v = (NORMAL.pdf(-e - t) - NORMAL.pdf(e - t)) / denominator
+    w = v * v + ((e - t) * NORMAL.pdf(e - t) + (e + t) * NORMAL.pdf(e + t)) / denominator
+    return v, w
+
+
+class Rating:
+    def __init__(self, mu=MU, sigma=SIGMA, games=0):
+        self.mu = mu
+        self.sigma = sigma
+        self.games = games
+
+    def conservative(self):
+        """A skill the team has with about 99% probability, used to rank the teams"""
+        return self.mu - 3 * self.sigma
+
+    def __repr__(self):
+        return f'Rating(mu={self.mu:.3f}, sigma={self.sigma:.3f}, games={self.games})'
+
+
+class RatingTable:
+    """
+    The ratings of the teams, updated with update_game (or update_games).
+    New teams start at Rating(); the table can be saved to and loaded from
+    JSON to keep updating it across runs.
+    """
+
+    def __init__(self, beta=BETA, tau=TAU, draw_probability=DRAW_PROBABILITY):
+        self.beta = beta
+        self.tau = tau
+        self.draw_probability = draw_probability
+        self.draw_margin = NORMAL.inv_cdf((draw_probability + 1) / 2) * math.sqrt(2) * beta
+        self.ratings = {}
+
+    def get(self, team):
+        if team not in self.ratings:
+            self.ratings[team] = Rating()
+        return self.ratings[team]
+
+    def update_game(self, red, blue, winner):
+        """Updates the two teams of a game; winner is one of them, or None for a tie"""
+        if red == blue:
+            return
+        first, second = (blue, red) if winner == blue else (red, blue)
+        a, b = self.get(first), self.get(second)
+        var_a = a.sigma ** 2 + self.tau ** 2
+        var_b = b.sigma ** 2 + self.tau ** 2
+        c = math.sqrt(2 * self.beta ** 2 + var_a + var_b)
+        t, e = (a.mu - b.mu) / c, self.draw_margin / c
+        v, w = _truncated_draw(t, e) if winner is None else _truncated_win(t, e)
+
+        a.mu += var_a / c * v
+        b.mu -= var_b / c * v
+        a.sigma = math.sqrt(var_a * max(1 - var_a / c ** 2 * w, 1e-6))
+        b.sigma = math.sqrt(var_b * max(1 - var_b / c ** 2 * w, 1e-6))
+        a.games += 1
+        b.games += 1
+
+    def update_games(self, games_data):
+        """Updates with games given as capture.get_games_data tuples (red, blue, layout, score, winner, ...)"""
+        for game in games_data:
+            self.update_game(game[0], game[1], game[4])
+
+    def win_probability(self, team, other):
+        """The probability that team is more skilled than other"""
+        a, b = self.get(team), self.get(other)
+        return NORMAL.cdf((a.mu - b.mu) / math.sqrt(a.sigma ** 2 + b.sigma ** 2 + 1e-12))
+
+    def match_quality(self, team, other):
+        """The probability of a draw between the two teams, relative to two equal teams (1 is the best match)"""
+        a, b = self.get(team), self.get(other)
+        c2 = 2 * self.beta ** 2 + a.sigma ** 2 + b.sigma ** 2
+        return math.sqrt(2 * self.beta ** 2 / c2) * math.exp(-(a.mu - b.mu) ** 2 / (2 * c2))
+
+    def get_ranking(self):
+        """Returns the teams, best first"""
+        return sorted(self.ratings, key=lambda team: (-self.ratings[team].conservative(), team))
+
+    def get_unsettled_pairs(self, confidence=CONFIDENCE, max_sigma=MAX_SIGMA):
+        """
+        Returns the consecutive teams of the ranking whose order is not known
+        with the given confidence, unless both ratings are within max_sigma.
+        """
+        ranking = self.get_ranking()
+        return [(better, worse) for better, worse in zip(ranking, ranking[1:])
+                if self.win_probability(better, worse) < confidence and
+                max(self.ratings[better].sigma, self.ratings[worse].sigma) > max_sigma]
+
+    def is_settled(self, confidence=CONFIDENCE, max_sigma=MAX_SIGMA):
+        """Whether the whole ranking is known (see get_unsettled_pairs), so that no more games are needed"""
+        return not self.get_unsettled_pairs(confidence, max_sigma)
+
+    def suggest_matches(self, count, confidence=CONFIDENCE, max_sigma=MAX_SIGMA):
+        """
+        Returns up to count pairs of teams to play next: the unsettled pairs
+        of the ranking, the most uncertain and evenly matched first.
+        """
+        pairs = self.get_unsettled_pairs(confidence, max_sigma)
+        pairs.sort(key=lambda pair: -(self.match_quality(*pair) *
+                                      (self.get(pair[0]).sigma ** 2 + self.get(pair[1]).sigma ** 2)))
+        return pairs[:count]
+
+    def to_json(self):
+        return {team: [rating.mu, rating.sigma, rating.games] for team, rating in self.ratings.items()}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=4, sort_keys=True)
+
+    @staticmethod
+    def load(path, **kwargs):
+        table = RatingTable(**kwargs)
+        with open(path) as f:
+            for team, (mu, sigma, games) in json.load(f).items():
+                table.ratings[team] = Rating(mu, sigma, games)
+        return table
+
+
+def read_scores(directory):
+    """Yields the games of the match_<id>.json files of capture.save_score, oldest match first"""
+    paths = glob.glob(os.path.join(directory, 'match_*.json'))
+    for path in sorted(paths, key=os.path.getmtime):
+        with open(path) as f:
+            yield from json.load(f)['games']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rates the teams of a contest from its results')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--db', help='results store (see results.py)')
+    source.add_argument('--scores', metavar='DIR', help='directory of match_<id>.json files')
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE,
+                        help='confidence required between consecutive teams (default: %(default)s)')
+    parser.add_argument('--max-sigma', type=float, default=MAX_SIGMA,
+                        help='uncertainty below which teams need no more games (default: %(default).2f)')
+    parser.add_argument('--suggest', type=int, default=5, help='number of matches to suggest (default: %(default)s)')
+    args = parser.parse_args()
+
+    table = RatingTable()
+    if args.db:
+        from contest.results import ResultStore
+        with ResultStore(args.db) as store:
+            table.update_games(store.get_results())
+    else:
+        table.update_games(read_scores(args.scores))
+
+    print('%-4s %-30s %8s %8s %8s %6s' % ('#', 'Team', 'Rating', 'Mu', 'Sigma', 'Games'))
+    for rank, team in enumerate(table.get_ranking(), 1):
+        rating = table.ratings[team]
+        print('%-4d %-30s %8.2f %8.2f %8.2f %6d' % (rank, team, rating.conservative(), rating.mu, rating.sigma,
+                                                    rating.games))
+    if table.is_settled(args.confidence, args.max_sigma):
+        print(f'\nThe ranking is settled with {args.confidence:.0%} confidence')
+    else:
+        unsettled = table.get_unsettled_pairs(args.confidence, args.max_sigma)
+        print(f'\n{len(unsettled)} consecutive pairs are not settled, play next:')
+        for team, other in table.suggest_matches(args.suggest, args.confidence, args.max_sigma):
+            print(f'  {team} vs {other}')
+
+
+if __name__ == '__main__':
+    main()
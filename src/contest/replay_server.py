@@ -0,0 +1,292 @@
+# replay_server.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A small HTTP server streaming recorded games to browsers, using only the
+standard library. It serves
+
+  /                      the viewer (replay_viewer.html), which draws the games on a canvas,
+  /api/replays           the index of the replays found under the replay directory, as JSON,
+  /api/events?replay=... a game as Server-Sent Events.
+
+A game starts with an 'init' event (walls, food, capsules, agents, team
+names) followed by one 'move' event per move holding only what the move
+changed, and ends with an 'end' event. The events of a replay are computed
+once, by re-simulating it headless with capture.replay_game, and shared by
+everyone watching it; they are paced by the server (delay=seconds per move,
+0 sends everything at once) and carry their move number as the SSE id, so
+browsers that reconnect resume where they were.
+
+Example:
+  python replay_server.py --dir www --port 8000
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import pickle
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import contest.capture as capture
+
+DEFAULT_DELAY = 0.05  # seconds between moves
+MAX_CACHED_GAMES = 32
+VIEWER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay_viewer.html')
+
+
+def encode_agent(agent_state):
+    """[x, y, is_pacman, direction, scared_timer], x and y None when the agent is off the board"""
+    if agent_state.configuration is None:
+        return [None, None, int(agent_state.is_pacman), None, agent_state.scared_timer]
+    x, y = agent_state.get_position()
+    return [int(x), int(y), int(agent_state.is_pacman), agent_state.configuration.direction,
+            agent_state.scared_timer]
+
+
+class EventRecorder:
+    """
+    A display turning a game into the events of the stream, as dicts. Move
+    events have the keys
+      n: move number, i: index of the agent that moved,
+      a: {index: encoded agent} of the agents that changed,
+      fe: food eaten, fa: food added, ce: capsule eaten (omitted when None),
+      s: score, t: time left.
+    """
+
+    def __init__(self):
+        self.red_team = 'Red'
+        self.blue_team = 'Blue'
+        self.events = []
+
+    def initialize(self, state, is_blue=False):
+        layout = state.layout
+        self.agents = [encode_agent(agent) for agent in state.agent_states]
+        self.events.append(('init', {
+            'width': layout.width,
+            'height': layout.height,
+            'layout': layout.layout_name,
+            'walls': [[x, y] for x in range(layout.width) for y in range(layout.height) if layout.walls[x][y]],
+            'food': [[x, y] for x in range(layout.width) for y in range(layout.height) if state.food[x][y]],
+            'capsules': [list(capsule) for capsule in state.capsules],
+            'agents': self.agents,
+            'red': self.red_team,
+            'blue': self.blue_team,
+            'score': state.score,
+            'timeleft': state.timeleft,
+        }))
+
+    def update(self, state):
+        event = {'n': len(self.events), 'i': state._agent_moved, 's': state.score, 't': state.timeleft}
+        # Every agent is compared, since a move can also eat or scare the others
+        changed = {}
+        for index, agent_state in enumerate(state.agent_states):
+            agent = encode_agent(agent_state)
+            if agent != self.agents[index]:
+                changed[index] = agent
+                self.agents[index] = agent
+        if changed:
+            event['a'] = changed
+        if state._food_eaten is not None:
+            event['fe'] = list(state._food_eaten)
+        if state._food_added is not None:
+            event['fa'] = [list(pos) for pos in state._food_added]
+        if state._capsule_eaten is not None:
+            event['ce'] = list(state._capsule_eaten)
+        self.events.append(('move', event))
+
+    def finish(self):
+        self.events.append(('end', {'n': len(self.events)}))
+
+
+def load_replay(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f, encoding="utf-8")
+
+
+def compute_events(path):
+    """Re-simulates a replay file headless; returns its events as (type, JSON data) pairs"""
+    replay = load_replay(path)
+    recorder = EventRecorder()
+    with contextlib.redirect_stdout(io.StringIO()):
+        capture.replay_game(replay['layout'], replay['agents'], replay['actions'], recorder, replay['length'],
+                            replay.get('red_team_name', 'Red'), replay.get('blue_team_name', 'Blue'),
+                            wait_end=False, delay=0)
+    return [(kind, json.dumps(data, separators=(',', ':'))) for kind, data in recorder.events]
+
+
+class ReplayLibrary:
+    """
+    The replay files under a directory, and the events of the recently
+    watched ones. Games are simulated once even when several viewers ask
+    for them at the same time.
+    """
+
+    def __init__(self, directory, max_cached=MAX_CACHED_GAMES):
+        self.directory = os.path.abspath(directory)
+        self.max_cached = max_cached
+        self.games = collections.OrderedDict()  # relative path -> events
+        self.summaries = {}  # relative path -> (mtime, summary)
+        self.lock = threading.Lock()
+        self.simulating = {}  # relative path -> lock held while simulating it
+
+    def find(self):
+        """Returns the relative paths of the replay files, newest first"""
+        paths = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.replay'):
+                    paths.append(os.path.relpath(os.path.join(root, name), self.directory))
+        return sorted(paths, key=lambda path: -os.path.getmtime(os.path.join(self.directory, path)))
+
+    def get_path(self, replay):
+        """Returns the absolute path of a replay of the index, None for anything else"""
+        path = os.path.abspath(os.path.join(self.directory, replay))
+        if not path.startswith(self.directory + os.sep) or not path.endswith('.replay') or not os.path.isfile(path):
+            return None
+        return path
+
+    def get_index(self):
+        index = []
+        for replay in self.find():
+            path = os.path.join(self.directory, replay)
+            mtime = os.path.getmtime(path)
+            cached = self.summaries.get(replay)
+            if cached is None or cached[0] != mtime:
+                try:
+                    recorded = load_replay(path)
+                    summary = {'replay': replay, 'red': recorded.get('red_team_name', 'Red'),
+                               'blue': recorded.get('blue_team_name', 'Blue'),
+                               'layout': getattr(recorded['layout'], 'layout_name', None),
+                               'moves': len(recorded['actions'])}
+                except Exception as e:
+                    summary = {'replay': replay, 'error': str(e)}
+                cached = self.summaries[replay] = (mtime, summary)
+            index.append(cached[1])
+        return index
+
+    def get_events(self, replay):
+        """Returns the events of a replay of the index (see compute_events), simulating it if needed"""
+        path = self.get_path(replay)
+        if path is None:
+            return None
+        with self.lock:
+            if replay in self.games:
+                self.games.move_to_end(replay)
+                return self.games[replay]
+            simulating = self.simulating.setdefault(replay, threading.Lock())
+        with simulating:
+            with self.lock:
+                if replay in self.games:
+                    return self.games[replay]
+            events = compute_events(path)
+            with self.lock:
+                self.games[replay] = events
+                while len(self.games) > self.max_cached:
+                    self.games.popitem(last=False)
+                self.simulating.pop(replay, None)
+        return events
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    library = None  # set by serve
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path in ('/', '/index.html'):
+            with open(VIEWER_PATH, 'rb') as f:
+                self.send_body(f.read(), 'text/html; charset=utf-8')
+        elif url.path == '/api/replays':
+            self.send_body(json.dumps(self.library.get_index()).encode(), 'application/json')
+        elif url.path == '/api/events':
+            self.stream_events(query)
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self, query):
+        replay = query.get('replay', [''])[0]
+        try:
+            delay = max(0.0, float(query.get('delay', [DEFAULT_DELAY])[0]))
+            events = self.library.get_events(replay)
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+        if events is None:
+            self.send_error(404, 'Unknown replay %s' % replay)
+            return
+        start = 0
+        last_event_id = self.headers.get('Last-Event-ID')
+        if last_event_id is not None and last_event_id.isdigit():
+            start = min(int(last_event_id) + 1, len(events))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            # A browser that reconnects has the board already, and only gets the moves it missed
+            for number in range(start, len(events)):
+                kind, data = events[number]
+                self.wfile.write(('id: %d\nevent: %s\ndata: %s\n\n' % (number, kind, data)).encode())
+                if kind == 'move' and delay > 0:
+                    self.wfile.flush()
+                    time.sleep(delay)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the viewer went away
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def serve(directory, host='localhost', port=8000, quiet=False):
+    handler = type('Handler', (ReplayRequestHandler,), {'library': ReplayLibrary(directory)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    print('Serving the replays of %s on http://%s:%d/' % (os.path.abspath(directory), host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streams recorded games to browsers')
+    parser.add_argument('--dir', default='www', help='directory searched for .replay files (default: %(default)s)')
+    parser.add_argument('--host', default='localhost', help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: %(default)s)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not log the requests')
+    args = parser.parse_args()
+    serve(args.dir, args.host, args.port, args.quiet)
+
+
+if __name__ == '__main__':
+    main()
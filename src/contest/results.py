@@ -0,0 +1,256 @@
+# results.py
+# ----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A store of the results of a contest, in SQLite, with its leaderboard kept
+up to date as results come in.
+
+Every game is appended to the results table, and in the same transaction
+the standings of its two teams (points, wins, draws, losses, score, as in
+capture.compute_team_stats) are updated. Reading the leaderboard thus
+costs the same whatever the number of results, and the results are never
+re-read, except by rebuild_standings.
+
+The games of a match, teams and layout are replaced as a whole when they
+are appended again (a match run twice, or imported after
+capture.save_score stored it): the old results are deleted and taken out
+of the standings first.
+
+capture.save_score appends every match to www/contest_<name>/results.db.
+
+Examples:
+  python results.py --db www/contest_default/results.db
+  python results.py --db www/contest_default/results.db --import-scores www/contest_default/scores
+  python results.py --db www/contest_default/results.db --export leaderboard.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+
+POINTS_WIN = 3
+POINTS_DRAW = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id INTEGER,
+    red TEXT NOT NULL,
+    blue TEXT NOT NULL,
+    layout TEXT,
+    score INTEGER NOT NULL,
+    winner TEXT,
+    time_taken REAL,
+    max_steps INTEGER,
+    recorded REAL NOT NULL,
+    game INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS standings (
+    team TEXT PRIMARY KEY,
+    points INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    score INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+UNIQUE_GAMES = """
+CREATE UNIQUE INDEX IF NOT EXISTS results_game ON results (match_id, red, blue, layout, game)
+"""
+
+UPDATE_STANDING = """
+INSERT INTO standings (team, points, wins, draws, losses, score) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (team) DO UPDATE SET points = points + excluded.points, wins = wins + excluded.wins,
+    draws = draws + excluded.draws, losses = losses + excluded.losses, score = score + excluded.score
+"""
+
+
+def get_standing_changes(red, blue, score, winner, sign=1):
+    """
+    Returns the (team, points, wins, draws, losses, score) rows a game adds
+    to the standings, or takes from them with sign=-1.
+    """
+    changes = []
+    for team in (red, blue):
+        if winner is None:
+            change = (POINTS_DRAW, 0, 1, 0, 0)
+        elif winner == team:
+            change = (POINTS_WIN, 1, 0, 0, score)
+        else:
+            change = (0, 0, 0, 1, 0)
+        changes.append((team,) + tuple(sign * value for value in change))
+    return changes
+
+
+class ResultStore:
+    """
+    The results and standings of a contest in an SQLite file. Several
+    processes can append to the same file: SQLite serializes the writes.
+    """
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.executescript(SCHEMA)
+        self._add_game_numbers()
+        self.connection.execute(UNIQUE_GAMES)
+
+    def _add_game_numbers(self):
+        """
+        Adds the game column to a store created without it, numbering the
+        games that share a match, teams and layout in the order they came.
+        """
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        if 'game' in columns:
+            return
+        with self.connection:
+            self.connection.execute('ALTER TABLE results ADD COLUMN game INTEGER NOT NULL DEFAULT 0')
+            self.connection.execute(
+                'UPDATE results SET game = (SELECT COUNT(*) FROM results AS earlier'
+                ' WHERE earlier.match_id IS results.match_id AND earlier.red = results.red'
+                ' AND earlier.blue = results.blue AND earlier.layout IS results.layout AND earlier.id < results.id)')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append_games(self, games_data, max_steps=None):
+        """
+        Appends games given as capture.get_games_data tuples
+        (red, blue, layout, score, winner, time_taken, match_id) and
+        updates the standings, all in one transaction. The games of a match
+        on the same layout are numbered in the order given. They replace
+        all the games stored for that match, teams and layout, which are
+        taken out of the standings, so that running a match again leaves
+        no stale result behind.
+        """
+        recorded = time.time()
+        game_numbers = {}
+        with self.connection:
+            for red, blue, layout, _, _, _, match_id in games_data:
+                key = (match_id, red, blue, layout)
+                if key not in game_numbers:
+                    self._delete_games(key)
+                    game_numbers[key] = 0
+            for red, blue, layout, score, winner, time_taken, match_id in games_data:
+                key = (match_id, red, blue, layout)
+                game = game_numbers[key]
+                game_numbers[key] += 1
+                self.connection.execute(
+                    'INSERT INTO results (match_id, red, blue, layout, game, score, winner, time_taken, max_steps,'
+                    ' recorded) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    key + (game, score, winner, time_taken, max_steps, recorded))
+                self.connection.executemany(UPDATE_STANDING, get_standing_changes(red, blue, score, winner))
+
+    def _delete_games(self, key):
+        """Deletes the games of a (match_id, red, blue, layout) and takes them out of the standings"""
+        where = ' WHERE match_id IS ? AND red = ? AND blue = ? AND layout IS ?'
+        _, red, blue, _ = key
+        for score, winner in self.connection.execute('SELECT score, winner FROM results' + where, key).fetchall():
+            self.connection.executemany(UPDATE_STANDING, get_standing_changes(red, blue, score, winner, sign=-1))
+        self.connection.execute('DELETE FROM results' + where, key)
+
+    def get_results(self):
+        """Yields the games as get_games_data tuples, in the order they were appended"""
+        yield from self.connection.execute(
+            'SELECT red, blue, layout, score, winner, time_taken, match_id FROM results ORDER BY id')
+
+    def get_leaderboard(self):
+        """
+        Returns the teams from first to last as dicts with the fields of
+        compute_team_stats: percentage, points, wins, draws, losses, errors and score.
+        """
+        rows = self.connection.execute(
+            'SELECT team, points, wins, draws, losses, errors, score FROM standings'
+            ' ORDER BY points DESC, wins DESC, score DESC, team')
+        leaderboard = []
+        for team, points, wins, draws, losses, errors, score in rows:
+            games = wins + draws + losses
+            leaderboard.append({
+                'team': team,
+                'percentage': (points * 100) / (POINTS_WIN * games) if games > 0 else 0,
+                'points': points,
+                'wins': wins,
+                'draws': draws,
+                'losses': losses,
+                'errors': errors,
+                'score': score,
+            })
+        return leaderboard
+
+    def export_leaderboard(self, path):
+        """Writes the leaderboard to a JSON file, replacing it atomically"""
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(self.get_leaderboard(), f, indent=4)
+        os.replace(temporary_path, path)
+
+    def rebuild_standings(self):
+        """Recomputes the standings from all the results, e.g. after editing the results by hand"""
+        with self.connection:
+            self.connection.execute('DELETE FROM standings')
+            for red, blue, _, score, winner, _, _ in list(self.get_results()):
+                self.connection.executemany(UPDATE_STANDING, get_standing_changes(red, blue, score, winner))
+
+    def import_scores(self, directory):
+        """
+        Appends the matches of the match_<id>.json files written by
+        capture.save_score, replacing those already stored; returns their number.
+        """
+        paths = glob.glob(os.path.join(directory, 'match_*.json'))
+        for path in sorted(paths, key=os.path.getmtime):
+            with open(path) as f:
+                match_data = json.load(f)
+            self.append_games([tuple(game) for game in match_data['games']], match_data.get('max_steps'))
+        return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shows the leaderboard of a contest results store')
+    parser.add_argument('--db', required=True, help='results store (an SQLite file)')
+    parser.add_argument('--import-scores', metavar='DIR',
+                        help='first appends the match_<id>.json files of a scores directory (replacing stored ones)')
+    parser.add_argument('--rebuild', action='store_true', help='first recomputes the standings from the results')
+    parser.add_argument('--export', metavar='FILE', help='writes the leaderboard to a JSON file instead')
+    args = parser.parse_args()
+
+    with ResultStore(args.db) as store:
+        if args.import_scores:
+            print('Imported %d matches' % store.import_scores(args.import_scores))
+        if args.rebuild:
+            store.rebuild_standings()
+        if args.export:
+            store.export_leaderboard(args.export)
+            return
+        leaderboard = store.get_leaderboard()
+        width = max([len('Team')] + [len(row['team']) for row in leaderboard])
+        print('%-4s %-*s %7s %6s %5s %5s %6s %6s' % ('#', width, 'Team', '%', 'Points', 'Wins', 'Draws', 'Losses',
+                                                     'Score'))
+        for rank, row in enumerate(leaderboard, 1):
+            print('%-4d %-*s %7.2f %6d %5d %5d %6d %6d' % (rank, width, row['team'], row['percentage'], row['points'],
+                                                           row['wins'], row['draws'], row['losses'], row['score']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# rollout.py
+# ----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A lightweight simulator of the capture rules for Monte Carlo playouts.
+
+A SimState is a tuple of plain values: cells are ints (x * height + y), the
+food is a bitmask of cells and every agent is a tuple (cell, is_pacman,
+scared_timer, num_carrying, num_returned), with cell None for the agents
+out of sight. Everything that does not change during a game (legal moves,
+sides, starts, teams) lives in a RolloutSimulator built once per game.
+Successors follow capture.AgentRules exactly: moves, eating food and
+capsules, returning food, deaths, food dumping and scared timers.
+
+Example:
+  simulator = RolloutSimulator(game_state)
+  state = simulator.from_game_state(game_state)
+  value = simulator.rollout(state, agent_index, depth=20, rng=random.Random())
+
+tests/test_rollout.py checks it move by move against the engine. Run this
+module to time both:
+  python -m contest.rollout --layouts defaultCapture,jumboCapture --playouts 500
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+
+import contest.capture as capture
+from contest.capture import DUMP_FOOD_ON_DEATH, KILL_POINTS, MIN_FOOD, SCARED_TIME
+from contest.game import Configuration, Directions
+
+SimState = namedtuple('SimState', ['agents', 'food', 'capsules', 'score', 'timeleft', 'win'])
+
+# Fields of the agent tuples of a SimState
+CELL, IS_PACMAN, SCARED_TIMER, NUM_CARRYING, NUM_RETURNED = range(5)
+
+
+class RolloutSimulator:
+    """The static parts of a game and the rules over SimStates"""
+
+    def __init__(self, game_state):
+        layout = game_state.data.layout
+        self.width, self.height = width, height = layout.width, layout.height
+        self.walls = layout.walls
+        self.halfway = width // 2
+        self.num_agents = game_state.get_num_agents()
+        self.is_red = tuple(game_state.is_on_red_team(i) for i in range(self.num_agents))
+        self.teams = {True: game_state.get_red_team_indices(), False: game_state.get_blue_team_indices()}
+        self.starts = tuple(self.to_cell(pos) for _, pos in layout.agent_positions[:self.num_agents])
+        self.food_to_win = (layout.total_food / 2) - MIN_FOOD
+
+        # Whether every cell is on the red half, and the cells reached by every legal action
+        self.red_side = [x < self.halfway for x in range(width) for _ in range(height)]
+        self.moves = [None] * (width * height)
+        for (x, y), actions in layout.get_legal_actions_table().items():
+            moves = {}
+            for action in actions:
+                dx, dy = capture.Actions.direction_to_vector(action)
+                moves[action] = self.to_cell((x + dx, y + dy))
+            self.moves[self.to_cell((x, y))] = moves
+        self._dump_cells = {}
+
+    def to_cell(self, pos):
+        return int(pos[0]) * self.height + int(pos[1])
+
+    def to_pos(self, cell):
+        return divmod(cell, self.height)
+
+    ##############
+    # Conversion #
+    ##############
+
+    def from_game_state(self, game_state):
+        """Returns the SimState of a GameState (or of an observation)"""
+        data = game_state.data
+        agents = []
+        for agent in data.agent_states:
+            pos = agent.get_position()
+            agents.append((None if pos is None else self.to_cell(pos), agent.is_pacman, agent.scared_timer,
+                           agent.num_carrying, agent.num_returned))
+        food = 0
+        for x, column in enumerate(data.food.data):
+            for y, has_food in enumerate(column):
+                if has_food:
+                    food |= 1 << (x * self.height + y)
+        capsules = frozenset(self.to_cell(pos) for pos in data.capsules)
+        return SimState(tuple(agents), food, capsules, data.score, data.timeleft, data._win)
+
+    def to_game_state(self, state, template):
+        """
+        Returns a GameState with the contents of a SimState, copying the rest
+        (teams, layout, directions of the agents that did not move) from template.
+        """
+        game_state = template.deep_copy()
+        data = game_state.data
+        for agent_state, (cell, is_pacman, scared_timer, num_carrying, num_returned) in \
+                zip(data.agent_states, state.agents):
+            if cell is None:
+                agent_state.configuration = None
+            elif agent_state.configuration is None or self.to_cell(agent_state.get_position()) != cell:
+                x, y = self.to_pos(cell)
+                agent_state.configuration = Configuration((float(x), float(y)), Directions.STOP)
+            agent_state.is_pacman = is_pacman
+            agent_state.scared_timer = scared_timer
+            agent_state.num_carrying = num_carrying
+            agent_state.num_returned = num_returned
+        for x in range(self.width):
+            for y in range(self.height):
+                data.food[x][y] = bool(state.food >> (x * self.height + y) & 1)
+        data.capsules = [self.to_pos(cell) for cell in sorted(state.capsules)]
+        for team, indices in ((capture.RED_TEAM, self.teams[True]), (capture.BLUE_TEAM, self.teams[False])):
+            data.team_carrying[team] = sum(state.agents[i][NUM_CARRYING] for i in indices)
+            data.team_returned[team] = sum(state.agents[i][NUM_RETURNED] for i in indices)
+        data.score, data.timeleft, data._win = state.score, state.timeleft, state.win
+        return game_state
+
+    #########
+    # Rules #
+    #########
+
+    def get_legal_actions(self, state, agent_index):
+        return list(self.moves[state.agents[agent_index][CELL]])
+
+    def is_over(self, state):
+        """Whether the game is over, by a win or because the time is up"""
+        return state.win or state.timeleft <= 0
+
+    def generate_successor(self, state, agent_index, action):
+        """Returns the SimState after the agent takes the action"""
+        agents = list(state.agents)
+        cell, _, scared_timer, num_carrying, num_returned = agents[agent_index]
+        cell = self.moves[cell].get(action)
+        if cell is None:
+            raise Exception("Illegal action " + str(action))
+        is_red = self.is_red[agent_index]
+        is_pacman = is_red != self.red_side[cell]
+        # Like GameStateData, a state is only won by the move that wins the game
+        food, capsules, score, win = state.food, state.capsules, state.score, False
+
+        # Return the food
+        if num_carrying > 0 and not is_pacman:
+            score += num_carrying if is_red else -num_carrying
+            num_returned += num_carrying
+            num_carrying = 0
+        agents[agent_index] = (cell, is_pacman, scared_timer, num_carrying, num_returned)
+        if num_returned != state.agents[agent_index][NUM_RETURNED]:
+            if max(sum(agents[i][NUM_RETURNED] for i in self.teams[True]),
+                   sum(agents[i][NUM_RETURNED] for i in self.teams[False])) >= self.food_to_win:
+                win = True
+
+        # Eat
+        if is_pacman:
+            if food >> cell & 1:
+                food ^= 1 << cell
+                for i in self.teams[is_red]:
+                    if agents[i][CELL] == cell:
+                        agents[i] = agents[i][:NUM_CARRYING] + (agents[i][NUM_CARRYING] + 1,) + agents[i][NUM_RETURNED:]
+                        break
+            if cell in capsules and self.red_side[cell] != is_red:
+                capsules = capsules - {cell}
+                for i in self.teams[not is_red]:
+                    agents[i] = agents[i][:SCARED_TIMER] + (SCARED_TIME,) + agents[i][NUM_CARRYING:]
+
+        score, food = self.check_death(agents, agent_index, score, food, capsules)
+
+        # Decrement the scared timer of the agent
+        agent = agents[agent_index]
+        if agent[SCARED_TIMER] > 0:
+            agents[agent_index] = agent[:SCARED_TIMER] + (agent[SCARED_TIMER] - 1,) + agent[NUM_CARRYING:]
+        return SimState(tuple(agents), food, capsules, score, state.timeleft - 1, win)
+
+    def check_death(self, agents, agent_index, score, food, capsules):
+        """Applies the collisions of the agent with its opponents to agents, returns the score and food"""
+        is_red = self.is_red[agent_index]
+        kill_points = -KILL_POINTS if is_red else KILL_POINTS
+        is_pacman = agents[agent_index][IS_PACMAN]
+        for index in self.teams[not is_red]:
+            agent, other = agents[agent_index], agents[index]
+            if other[CELL] is None or other[CELL] != agent[CELL] or other[IS_PACMAN] == is_pacman:
+                continue
+            if is_pacman:
+                if other[SCARED_TIMER] <= 0:
+                    food = self.dump_food(agents, agent_index, food, capsules)
+                    eaten = agent_index
+                else:
+                    eaten = index
+                score += kill_points
+            else:
+                if agent[SCARED_TIMER] <= 0:
+                    food = self.dump_food(agents, index, food, capsules)
+                    eaten = index
+                    score -= kill_points
+                else:
+                    eaten = agent_index
+                    score += kill_points
+            agents[eaten] = (self.starts[eaten], False, 0) + agents[eaten][NUM_CARRYING:]
+        return score, food
+
+    def dump_food(self, agents, agent_index, food, capsules):
+        """Drops the food the agent carries around it, returns the new food"""
+        cell, _, _, num_carrying, _ = agents[agent_index]
+        if not DUMP_FOOD_ON_DEATH or num_carrying == 0:
+            return food
+
+        occupied = {agent[CELL] for agent in agents}
+        for dump_cell in self.get_dump_cells(cell):
+            if not food >> dump_cell & 1 and dump_cell not in capsules and dump_cell not in occupied:
+                food |= 1 << dump_cell
+                num_carrying -= 1
+                if num_carrying == 0:
+                    break
+        else:
+            raise Exception('Exhausted BFS! uh oh')
+        agents[agent_index] = agents[agent_index][:NUM_CARRYING] + (0,) + agents[agent_index][NUM_RETURNED:]
+        return food
+
+    def get_dump_cells(self, cell):
+        """
+        Returns the cells where food may be dumped on a death at cell, in the
+        order of capture.dump_order: inside the board, open, and on the same half.
+        """
+        cells = self._dump_cells.get(cell)
+        if cells is None:
+            start_x, start_y = self.to_pos(cell)
+            is_red = start_x < self.halfway
+            cells = []
+            for dx, dy in capture.dump_order(max(self.width, self.height)):
+                x, y = start_x + dx, start_y + dy
+                if 0 < x < self.width and 0 < y < self.height and not self.walls[x][y] and \
+                        (x < self.halfway) == is_red:
+                    cells.append(x * self.height + y)
+            self._dump_cells[cell] = cells
+        return cells
+
+    ############
+    # Playouts #
+    ############
+
+    def rollout(self, state, agent_index, depth, rng, evaluate=None):
+        """
+        Plays random moves, agents taking turns from agent_index, for depth
+        moves or until the game is over. Returns evaluate(final state) or the
+        final state if evaluate is None. Agents out of sight do not move.
+        """
+        num_agents = self.num_agents
+        for _ in range(depth):
+            if state.win or state.timeleft <= 0:
+                break
+            cell = state.agents[agent_index][CELL]
+            if cell is not None:
+                state = self.generate_successor(state, agent_index, rng.choice(list(self.moves[cell])))
+            agent_index = (agent_index + 1) % num_agents
+        return state if evaluate is None else evaluate(state)
+
+
+##########
+# Timing #
+##########
+
+def initial_state(layout_name, length=1200):
+    import contest.layout as layout
+    if layout_name.startswith('RANDOM'):
+        name, text = capture.random_layout(seed=int(layout_name[6:]))
+        game_layout = layout.Layout(layout_name=name, layout_text=text.split('\n'))
+    else:
+        game_layout = layout.get_layout(capture.DIR_SCRIPT + '/layouts/' + layout_name)
+    state = capture.GameState()
+    state.initialize(game_layout, 4)
+    state.data.timeleft = length
+    return state
+
+
+def time_playouts(layout_name, playouts, depth, seed):
+    """Returns the moves per second of random playouts with the engine and with the simulator"""
+    game_state = initial_state(layout_name)
+    simulator = RolloutSimulator(game_state)
+    state = simulator.from_game_state(game_state)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(playouts):
+        successor, agent_index = game_state, 0
+        for _ in range(depth):
+            if successor.is_over():
+                break
+            successor = successor.generate_successor(agent_index, rng.choice(successor.get_legal_actions(agent_index)))
+            agent_index = (agent_index + 1) % successor.get_num_agents()
+    engine = playouts * depth / (time.perf_counter() - start)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(playouts):
+        simulator.rollout(state, 0, depth, rng)
+    return engine, playouts * depth / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times random playouts with the engine and the rollout simulator.')
+    parser.add_argument('--layouts', default='defaultCapture,jumboCapture,alleyCapture,RANDOM13',
+                        help='Comma separated layouts [Default: defaultCapture,jumboCapture,alleyCapture,RANDOM13]')
+    parser.add_argument('--playouts', type=int, default=200, help='Playouts timed per layout [Default: 200]')
+    parser.add_argument('--depth', type=int, default=50, help='Moves per playout [Default: 50]')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed [Default: 1]')
+    options = parser.parse_args()
+
+    for layout_name in options.layouts.split(','):
+        engine, simulator = time_playouts(layout_name, options.playouts, options.depth, options.seed)
+        print(f'{layout_name}: engine {engine:.0f} moves/s, simulator {simulator:.0f} moves/s '
+              f'({simulator / engine:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
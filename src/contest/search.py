@@ -0,0 +1,414 @@
+# search.py
+# ---------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Time-budgeted adversarial search over capture GameStates.
+
+All the searches take the index of the agent that moves at the root and an
+evaluation function evaluate(game_state), which scores a state for the team
+of that agent (higher is better). Bound methods of a CaptureAgent, such as
+get_score, work as they are. Agents take turns in index order, and the
+agents whose position is unknown (opponents out of sight) are left out.
+
+  * AlphaBetaSearch: iterative-deepening minimax with alpha-beta pruning,
+    ordering first the best move found for each state by the previous
+    iterations.
+  * ExpectimaxSearch: the same, with opponents moving uniformly at random.
+  * MonteCarloTreeSearch: UCT with random rollouts cut off by evaluate.
+
+search(game_state, deadline) returns the best action found when the deadline
+expires. A Deadline defaults to the move warning time of CaptureRules minus a
+safety margin, so agents stop cleanly before they are warned:
+
+  searcher = AlphaBetaSearch(self.index, self.get_score)
+  action = searcher.search(game_state, Deadline(margin=0.2))
+
+Or simply subclass SearchCaptureAgent and override evaluate_state.
+"""
+
+import math
+import random
+import time
+from collections import OrderedDict
+
+from contest.capture import CaptureRules
+from contest.capture_agents import CaptureAgent
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the searches when their deadline expires"""
+    pass
+
+
+class Deadline:
+    """
+    The time a search has left. By default, the move warning time of
+    CaptureRules minus margin seconds, counted from the creation of the deadline.
+    """
+
+    def __init__(self, seconds=None, margin=0.1):
+        if seconds is None:
+            seconds = CaptureRules.get_move_warning_time() - margin
+        self.start = time.perf_counter()
+        self.end = self.start + seconds
+
+    def remaining(self):
+        return self.end - time.perf_counter()
+
+    def expired(self):
+        return time.perf_counter() >= self.end
+
+    def check(self):
+        if time.perf_counter() >= self.end:
+            raise SearchTimeout()
+
+
+class TranspositionTable:
+    """
+    The values found for the states searched, by state_key, evicting the
+    least recently used entries beyond max_entries. It can be kept from one
+    move to the next as long as the evaluation function does not change.
+    """
+
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def state_key(game_state, agent_index):
+    """
+    Returns a hashable key of everything in the state that affects the rest
+    of the game, with the agent to move.
+    """
+    data = game_state.data
+    agents = tuple((agent.get_position(), agent.is_pacman, agent.scared_timer, agent.num_carrying)
+                   for agent in data.agent_states)
+    return agent_index, data.score, agents, tuple(data.capsules), tuple(map(tuple, data.food.data))
+
+
+class AdversarialSearch:
+    """
+    The common parts of the tree searches: the turn order of the agents and
+    the iterative deepening of the search from the root.
+    """
+
+    def __init__(self, index, evaluate, max_depth=64, table=None):
+        self.index = index
+        self.evaluate = evaluate
+        self.max_depth = max_depth
+        self.table = table if table is not None else TranspositionTable()
+        self.deadline = None
+        self.order = None
+        self.team = None
+
+        # Statistics of the last search
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def start_search(self, game_state, deadline):
+        self.deadline = deadline or Deadline()
+        num_agents = game_state.get_num_agents()
+        self.order = [(self.index + i) % num_agents for i in range(num_agents)
+                      if game_state.get_agent_position((self.index + i) % num_agents) is not None]
+        is_red = game_state.is_on_red_team(self.index)
+        self.team = {i for i in self.order if game_state.is_on_red_team(i) == is_red}
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def search(self, game_state, deadline=None):
+        """Returns the best action of the agent found before the deadline."""
+        self.start_search(game_state, deadline)
+        legal = game_state.get_legal_actions(self.index)
+        best_action = legal[0]
+        try:
+            for depth in range(1, self.max_depth + 1):
+                best_action = self.search_root(game_state, depth, best_action)
+                self.depth_reached = depth
+        except SearchTimeout:
+            pass
+        return best_action
+
+    def search_root(self, game_state, depth, best_action):
+        raise NotImplementedError
+
+    def ordered_successors(self, game_state, agent_index, best_action):
+        """Returns the (action, successor) pairs of the agent, best_action first."""
+        successors = game_state.generate_successors(agent_index)
+        if best_action is not None:
+            successors.sort(key=lambda pair: pair[0] != best_action)
+        return successors
+
+
+class AlphaBetaSearch(AdversarialSearch):
+    """Iterative-deepening minimax with alpha-beta pruning and a transposition table"""
+
+    def search_root(self, game_state, depth, best_action):
+        alpha = -math.inf
+        for action, successor in self.ordered_successors(game_state, self.index, best_action):
+            value = self.get_value(successor, depth - 1, 1 % len(self.order), alpha, math.inf)
+            if value > alpha:
+                alpha, best_action = value, action
+        return best_action
+
+    def get_value(self, game_state, depth, turn, alpha, beta):
+        self.deadline.check()
+        self.nodes += 1
+        if depth == 0 or game_state.is_over():
+            return self.evaluate(game_state)
+
+        agent_index = self.order[turn]
+        key = state_key(game_state, agent_index)
+        entry = self.table.get(key)
+        best_action = None
+        if entry is not None:
+            entry_depth, value, bound, best_action = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                elif bound == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        maximize = agent_index in self.team
+        alpha0, beta0 = alpha, beta
+        best_value = -math.inf if maximize else math.inf
+        next_turn = (turn + 1) % len(self.order)
+        for action, successor in self.ordered_successors(game_state, agent_index, best_action):
+            value = self.get_value(successor, depth - 1, next_turn, alpha, beta)
+            if maximize and value > best_value or not maximize and value < best_value:
+                best_value, best_action = value, action
+            if maximize:
+                alpha = max(alpha, best_value)
+            else:
+                beta = min(beta, best_value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha0:
+            bound = UPPER_BOUND
+        elif best_value >= beta0:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.put(key, (depth, best_value, bound, best_action))
+        return best_value
+
+
+class ExpectimaxSearch(AdversarialSearch):
+    """Iterative-deepening expectimax: the opponents move uniformly at random"""
+
+    def search_root(self, game_state, depth, best_action):
+        best_value = -math.inf
+        for action, successor in self.ordered_successors(game_state, self.index, best_action):
+            value = self.get_value(successor, depth - 1, 1 % len(self.order))
+            if value > best_value:
+                best_value, best_action = value, action
+        return best_action
+
+    def get_value(self, game_state, depth, turn):
+        self.deadline.check()
+        self.nodes += 1
+        if depth == 0 or game_state.is_over():
+            return self.evaluate(game_state)
+
+        agent_index = self.order[turn]
+        key = state_key(game_state, agent_index)
+        entry = self.table.get(key)
+        best_action = None
+        if entry is not None:
+            entry_depth, value, _, best_action = entry
+            if entry_depth >= depth:
+                return value
+
+        next_turn = (turn + 1) % len(self.order)
+        successors = self.ordered_successors(game_state, agent_index, best_action)
+        values = [(self.get_value(successor, depth - 1, next_turn), action) for action, successor in successors]
+        if agent_index in self.team:
+            value, best_action = max(values, key=lambda pair: pair[0])
+        else:
+            value = sum(v for v, _ in values) / len(values)
+        self.table.put(key, (depth, value, EXACT, best_action))
+        return value
+
+
+class MonteCarloTreeSearch:
+    """
+    UCT: grows a tree of the states visited by the agents, choosing moves with
+    UCB1 (opponents minimize), and scores new leaves with a random rollout of
+    rollout_depth moves cut off by evaluate. Values are rescaled to [0, 1]
+    with the extremes seen so far, so exploration does not depend on the
+    scale of evaluate.
+
+    The moves are drawn from rng, by default the rng of the agent evaluate
+    is a method of (see Agent.rng), read at every search since the rules
+    replace it for every game; the search is then reproducible from the
+    seed of the game.
+    """
+
+    def __init__(self, index, evaluate, rollout_depth=10, exploration=math.sqrt(2), rng=None):
+        self.index = index
+        self.evaluate = evaluate
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.rng = rng
+        self.agent = None
+        if rng is None:
+            self.agent = getattr(evaluate, '__self__', None)
+            if not isinstance(getattr(self.agent, 'rng', None), random.Random):
+                raise Exception('MonteCarloTreeSearch needs an rng when evaluate is not a method of an agent')
+        self.order = None
+        self.team = None
+        self.min_value = self.max_value = None
+
+        # Statistics of the last search
+        self.iterations = 0
+
+    def search(self, game_state, deadline=None):
+        """Returns the most visited action of the agent when the deadline expires."""
+        deadline = deadline or Deadline()
+        if self.agent is not None:
+            self.rng = self.agent.rng
+        num_agents = game_state.get_num_agents()
+        self.order = [(self.index + i) % num_agents for i in range(num_agents)
+                      if game_state.get_agent_position((self.index + i) % num_agents) is not None]
+        is_red = game_state.is_on_red_team(self.index)
+        self.team = {i for i in self.order if game_state.is_on_red_team(i) == is_red}
+        self.min_value = self.max_value = None
+        self.iterations = 0
+
+        root = TreeNode(game_state, 0, self.order[0])
+        while not deadline.expired():
+            self.run_iteration(root)
+            self.iterations += 1
+        if not root.children:
+            return game_state.get_legal_actions(self.index)[0]
+        return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+    def run_iteration(self, root):
+        # Selection
+        node = root
+        while not node.untried and node.children:
+            node = self.select_child(node)
+
+        # Expansion
+        if node.untried:
+            action = node.untried.pop(self.rng.randrange(len(node.untried)))
+            turn = (node.turn + 1) % len(self.order)
+            successor = node.game_state.generate_successor(node.agent_index, action)
+            child = TreeNode(successor, turn, self.order[turn], node)
+            node.children[action] = child
+            node = child
+
+        # Simulation
+        value = self.rollout(node.game_state, node.turn)
+        if self.min_value is None:
+            self.min_value = self.max_value = value
+        self.min_value, self.max_value = min(self.min_value, value), max(self.max_value, value)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            node.total += value
+            node = node.parent
+
+    def select_child(self, node):
+        spread = (self.max_value - self.min_value) or 1.0
+        maximize = node.agent_index in self.team
+        log_visits = math.log(node.visits)
+
+        def ucb(child):
+            mean = (child.total / child.visits - self.min_value) / spread
+            if not maximize:
+                mean = 1.0 - mean
+            return mean + self.exploration * math.sqrt(log_visits / child.visits)
+
+        return max(node.children.values(), key=ucb)
+
+    def rollout(self, game_state, turn):
+        for _ in range(self.rollout_depth):
+            if game_state.is_over():
+                break
+            agent_index = self.order[turn]
+            action = self.rng.choice(game_state.get_legal_actions(agent_index))
+            game_state = game_state.generate_successor(agent_index, action)
+            turn = (turn + 1) % len(self.order)
+        return self.evaluate(game_state)
+
+
+class TreeNode:
+    """A state of the Monte Carlo tree, with the agent to move and the statistics of its subtree"""
+
+    def __init__(self, game_state, turn, agent_index, parent=None):
+        self.game_state = game_state
+        self.turn = turn
+        self.agent_index = agent_index
+        self.parent = parent
+        self.children = {}
+        self.untried = [] if game_state.is_over() else game_state.get_legal_actions(agent_index)
+        self.visits = 0
+        self.total = 0.0
+
+
+SEARCHES = {
+    'alpha_beta': AlphaBetaSearch,
+    'expectimax': ExpectimaxSearch,
+    'mcts': MonteCarloTreeSearch,
+}
+
+
+class SearchCaptureAgent(CaptureAgent):
+    """
+    A CaptureAgent that chooses its actions with one of the SEARCHES, within
+    the move warning time minus margin. Override evaluate_state.
+    """
+
+    def __init__(self, index, time_for_computing=.1, search='alpha_beta', margin=0.2):
+        super().__init__(index, time_for_computing)
+        self.search_name = search
+        self.margin = margin
+        self.searcher = None
+
+    def register_initial_state(self, game_state):
+        CaptureAgent.register_initial_state(self, game_state)
+        self.searcher = SEARCHES[self.search_name](self.index, self.evaluate_state)
+
+    def choose_action(self, game_state):
+        return self.searcher.search(game_state, Deadline(margin=self.margin))
+
+    def evaluate_state(self, game_state):
+        """Scores a state for the team of the agent"""
+        return self.get_score(game_state)
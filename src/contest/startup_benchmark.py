@@ -0,0 +1,134 @@
+# startup_benchmark.py
+# --------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Startup time of a headless game, which every game of a tournament pays.
+
+Runs a fresh interpreter with -X importtime that imports contest.capture
+and reads a command line (by default -Q, the teams being loaded as in a
+real game), and reports
+
+  * the import time of contest.capture, checked against a budget,
+  * the import time of everything the command line loaded (the teams too),
+    checked against a budget of the whole headless start,
+  * the slowest imports,
+  * the display modules that were loaded, which must be none when headless.
+
+The times are medians over several runs, after an untimed one so that the
+bytecode is cached (unless PYTHONDONTWRITEBYTECODE is set, in which case
+they include compiling the sources). The exit status is 1 when over a
+budget or when a display module was loaded, so it can run as a CI check.
+
+Example:
+  python startup_benchmark.py --repeat 5 --budget-ms 25 --total-budget-ms 75 -- -Q -r baseline_team -b baseline_team
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = 25.0  # import of contest.capture
+TOTAL_BUDGET_MS = 75.0  # all the imports of the command line, e.g. numpy (about 60 ms) would not fit
+DISPLAY_MODULES = ['tkinter', 'contest.graphics_utils', 'contest.graphics_display',
+                   'contest.capture_graphics_display', 'contest.keyboard_agents']
+
+MARKER = '-- startup done --'
+STARTUP_SCRIPT = """
+import sys
+sys.stderr.write('%s\\n')
+import contextlib, io, json
+import contest.capture as capture
+with contextlib.redirect_stdout(io.StringIO()):
+    capture.read_command(sys.argv[1:])
+print(json.dumps(sorted(sys.modules)))
+""" % MARKER
+
+
+def parse_import_times(stderr):
+    """
+    Returns [(module, self_us, cumulative_us, depth)] from the -X importtime
+    output, leaving out the imports of the interpreter startup (site...).
+    """
+    imports = []
+    for line in stderr.split(MARKER, 1)[-1].splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure_startup(command_args):
+    """Runs a fresh interpreter once; returns (import times, loaded modules)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT] + command_args,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception('The startup run failed:\n' + result.stderr[-2000:])
+    return parse_import_times(result.stderr), json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the startup time of a headless game')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs (default: %(default)s)')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS,
+                        help='budget of the contest.capture import, in ms (default: %(default)s)')
+    parser.add_argument('--total-budget-ms', type=float, default=TOTAL_BUDGET_MS,
+                        help='budget of all the imports of the command line, in ms (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports shown (default: %(default)s)')
+    parser.add_argument('command_args', nargs='*', default=['-Q'],
+                        help='arguments of capture.py, after -- (default: -Q)')
+    args = parser.parse_args()
+
+    measure_startup(args.command_args)  # caches the bytecode
+    capture_times, total_times, self_times = [], [], {}
+    modules = []
+    for _ in range(args.repeat):
+        imports, modules = measure_startup(args.command_args)
+        capture_times.append(next(cumulative for name, _, cumulative, _ in imports if name == 'contest.capture'))
+        total_times.append(sum(cumulative for name, _, cumulative, depth in imports if depth == 0))
+        for name, self_us, _, _ in imports:
+            self_times.setdefault(name, []).append(self_us)
+
+    capture_ms = statistics.median(capture_times) / 1000
+    total_ms = statistics.median(total_times) / 1000
+    print(f'Command line: {" ".join(args.command_args)}')
+    if sys.flags.dont_write_bytecode or os.environ.get('PYTHONDONTWRITEBYTECODE'):
+        print('(bytecode caching is disabled, the times include compiling the sources)')
+    print(f'import contest.capture: {capture_ms:8.1f} ms (budget {args.budget_ms:.1f} ms)')
+    print(f'all imports:            {total_ms:8.1f} ms (budget {args.total_budget_ms:.1f} ms)')
+    print('\nSlowest imports (self time):')
+    slowest = sorted(self_times.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    for name, times in slowest:
+        print(f'  {statistics.median(times) / 1000:8.1f} ms  {name}')
+
+    loaded_displays = [name for name in DISPLAY_MODULES if name in modules]
+    failed = False
+    if loaded_displays:
+        print(f'\nFAIL: display modules loaded: {", ".join(loaded_displays)}')
+        failed = True
+    if capture_ms > args.budget_ms:
+        print(f'\nFAIL: contest.capture takes {capture_ms:.1f} ms to import, over the {args.budget_ms:.1f} ms budget')
+        failed = True
+    if total_ms > args.total_budget_ms:
+        print(f'\nFAIL: the command line imports take {total_ms:.1f} ms, over the {args.total_budget_ms:.1f} ms budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,11 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import shutil
+import sys
 import time
+from contest.game import GameStateData
+from contest.util import nearest_point
 try: 
     import contest.pacman as pacman
 except:
@@ -22,6 +26,7 @@ DRAW_EVERY = 1
 SLEEP_TIME = 0 # This can be overwritten by __init__
 DISPLAY_MOVES = False
 QUIET = False # Supresses output
+TEXT_FPS = 10 # Frames per second of AnsiGraphics
 
 class NullGraphics:
     def initialize(self, state, is_blue = False):
@@ -79,3 +84,119 @@ class PacmanGraphics:
 
     def finish(self):
         pass
+
+class AnsiGraphics:
+    """
+    Draws the board in place on an ANSI terminal. Instead of printing the
+    whole board every move, it keeps what is on the screen and rewrites,
+    with cursor-addressed escape codes, only the cells that changed: the
+    food and capsules eaten or dumped and the cells agents left or entered,
+    as recorded in the GameStateData of every move. Frames are drawn at most
+    fps times per second (and on the last move), so fast games on large
+    layouts stay readable over slow connections. Anything printed by the
+    game scrolls in the lines below the board.
+    """
+
+    def __init__(self, fps=TEXT_FPS, stream=None, color=True):
+        self.fps = fps
+        self.stream = stream if stream is not None else sys.stdout
+        self.color = color
+
+    def initialize(self, state, is_blue = False):
+        self.state = state
+        self.width, self.height = state.layout.width, state.layout.height
+        self.screen = {}  # (x, y) -> string on the terminal
+        self.status = None
+        self.dirty = set((x, y) for x in range(self.width) for y in range(self.height))
+        self.agent_cells = [self.get_agent_cell(agent) for agent in state.agent_states]
+        self.last_draw = 0.0
+
+        # Clear the screen and hide the cursor; the game output scrolls below the board
+        out = ['\x1b[2J\x1b[?25l']
+        lines = shutil.get_terminal_size().lines
+        if lines > self.height + 2:
+            out.append('\x1b[%d;%dr' % (self.height + 2, lines))
+        out.append('\x1b[%d;1H' % (self.height + 2))
+        self.stream.write(''.join(out))
+        self.draw()
+
+    def update(self, state):
+        self.state = state
+        if state._food_eaten is not None:
+            self.dirty.add(state._food_eaten)
+        if state._food_added is not None:
+            self.dirty.update(state._food_added)
+        if state._capsule_eaten is not None:
+            self.dirty.add(state._capsule_eaten)
+        # Every agent, since moves also send the eaten ones back home
+        for index, agent in enumerate(state.agent_states):
+            cell = self.get_agent_cell(agent)
+            if cell != self.agent_cells[index]:
+                self.dirty.update(pos for pos in (self.agent_cells[index][0], cell[0]) if pos is not None)
+                self.agent_cells[index] = cell
+        if state._win or state._lose or time.time() - self.last_draw >= 1.0 / self.fps:
+            self.draw()
+
+    def get_agent_cell(self, agent):
+        """Returns the cell of an agent and what it looks like there"""
+        if agent.configuration is None:
+            return None, None
+        x, y = nearest_point(agent.configuration.pos)
+        return (int(x), int(y)), (agent.is_pacman, agent.configuration.direction)
+
+    def draw(self):
+        """Writes the cells that changed since the last frame"""
+        state = self.state
+        agents = {}
+        for index, (cell, _) in enumerate(self.agent_cells):
+            if cell is not None: agents[cell] = index
+        capsules = set(tuple(capsule) for capsule in state.capsules)
+
+        out = []
+        for x, y in self.dirty:
+            if not (0 <= x < self.width and 0 <= y < self.height): continue
+            string = self.cell_string(x, y, agents, capsules)
+            if self.screen.get((x, y)) != string:
+                out.append('\x1b[%d;%dH%s' % (self.height - y, x + 1, string))
+                self.screen[(x, y)] = string
+        self.dirty.clear()
+
+        status = 'Score: %d' % state.score
+        if state.timeleft is not None:
+            status += '    Time left: %d' % state.timeleft
+        if status != self.status:
+            out.append('\x1b[%d;1H%s\x1b[K' % (self.height + 1, status))
+            self.status = status
+
+        if out:
+            # Save and restore the cursor, which stays with the game output
+            self.stream.write('\x1b7' + ''.join(out) + '\x1b8')
+            self.stream.flush()
+        self.last_draw = time.time()
+
+    def cell_string(self, x, y, agents, capsules):
+        """The character of a cell, as in GameStateData.__str__"""
+        if (x, y) in capsules:
+            return 'o'
+        if (x, y) in agents:
+            index = agents[(x, y)]
+            agent = self.state.agent_states[index]
+            if agent.is_pacman:
+                char = GameStateData._pac_str(agent.configuration.direction)
+            else:
+                char = GameStateData._ghost_str()
+            if self.color:
+                # Red team on even indices, blue team on odd ones
+                return '\x1b[%dm%s\x1b[0m' % (31 if index % 2 == 0 else 34, char)
+            return char
+        return GameStateData._food_wall_str(self.state.food[x][y], self.state.layout.walls[x][y])
+
+    def update_distributions(self, dist):
+        pass
+
+    def finish(self):
+        self.draw()
+        # Reset the scrolling region, show the cursor and leave it below everything
+        lines = shutil.get_terminal_size().lines
+        self.stream.write('\x1b[r\x1b[?25h\x1b[%d;1H\n' % max(lines, self.height + 2))
+        self.stream.flush()
@@ -13,7 +13,6 @@
 
 
 import sys
-import inspect
 import heapq
 import random
 from functools import cmp_to_key
@@ -210,22 +209,183 @@ class PriorityQueue:
             self.push(item, priority)
 
 
-class PriorityQueueWithFunction(PriorityQueue):
+class IndexedPriorityQueue:
+    """
+      A priority queue over a binary heap that also maps every item to its
+      place in the heap, so that changing the priority of an item, removing
+      it or checking whether it is queued take O(log n) or O(1) instead of a
+      scan of the heap. Items must be hashable and are queued at most once:
+      pushing an item already in the queue changes its priority. Items of
+      equal priority are popped in the order they were pushed.
+
+      Subclasses can also queue plain entries (see _push_entry), left out of
+      the index: duplicates or unhashable items, only reached by pop.
+
+      >>> queue = IndexedPriorityQueue()
+      >>> queue.push('a', 3)
+      >>> queue.push('b', 1)
+      >>> queue.push('c', 2)
+      >>> queue.update('a', 0)
+      >>> queue.remove('c')
+      >>> 'c' in queue
+      False
+      >>> [queue.pop(), queue.pop()]
+      ['a', 'b']
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.index = {}
+        self.count = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def is_empty(self):
+        return len(self.heap) == 0
+
+    def push(self, item, priority):
+        """Queues the item, or changes its priority if it is already queued"""
+        if item in self.index:
+            self._set_priority(item, priority)
+            return
+        self._push_entry(item, priority, True)
+
+    def _push_entry(self, item, priority, indexed):
+        """Adds a heap entry for the item, in the index or not"""
+        self.heap.append((priority, self.count, item, indexed))
+        self.count += 1
+        if indexed:
+            self.index[item] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """Removes and returns the item with the lowest priority"""
+        item = self.heap[0][2]
+        self._remove_at(0)
+        return item
+
+    def peek(self):
+        """Returns the item with the lowest priority without removing it"""
+        return self.heap[0][2]
+
+    def get_priority(self, item):
+        return self.heap[self.index[item]][0]
+
+    def update(self, item, priority):
+        """
+        Like PriorityQueue.update: lowers the priority of a queued item (a
+        higher one is ignored) and pushes an item that is not queued.
+        """
+        if item not in self.index:
+            self._push_entry(item, priority, True)
+        elif priority < self.heap[self.index[item]][0]:
+            self._set_priority(item, priority)
+
+    def remove(self, item):
+        """Removes a queued item, raising KeyError if it is not queued"""
+        self._remove_at(self.index[item])
+
+    def _set_priority(self, item, priority):
+        position = self.index[item]
+        _, count, _, _ = self.heap[position]
+        self.heap[position] = (priority, count, item, True)
+        self._sift_down(self._sift_up(position))
+
+    def _remove_at(self, position):
+        heap = self.heap
+        if heap[position][3]:
+            del self.index[heap[position][2]]
+        last = heap.pop()
+        if position < len(heap):
+            heap[position] = last
+            self._sift_down(self._sift_up(position))
+
+    def _sift_up(self, position):
+        """Moves the entry at position up while it beats its parent, returns where it ends"""
+        heap, index = self.heap, self.index
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[position] = heap[parent]
+            if heap[position][3]:
+                index[heap[position][2]] = position
+            position = parent
+        heap[position] = entry
+        if entry[3]:
+            index[entry[2]] = position
+        return position
+
+    def _sift_down(self, position):
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[position] = heap[child]
+            if heap[position][3]:
+                index[heap[position][2]] = position
+            position = child
+        heap[position] = entry
+        if entry[3]:
+            index[entry[2]] = position
+        return position
+
+
+class PriorityQueueWithFunction(IndexedPriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
     Queue and the Stack classes. This is designed for drop-in replacement for
     those two classes. The caller has to provide a priority function, which
     extracts each item's priority.
+
+    As with PriorityQueue, pushing an item already queued adds a second
+    entry, and items need not be hashable. update is the opt-in
+    alternative: it lowers the priority of the queued item instead, in
+    O(log n). Only the first entry of a hashable item is indexed, for
+    update, remove and membership tests; the others are plain heap entries.
+
+    >>> queue = PriorityQueueWithFunction(len)
+    >>> queue.push(['North', 'East'])
+    >>> queue.push(['North', 'East'])
+    >>> queue.update('ab')
+    >>> queue.update('ab')
+    >>> len(queue)
+    3
+    >>> [queue.pop(), queue.pop(), queue.pop()]
+    [['North', 'East'], ['North', 'East'], 'ab']
     """
 
     def __init__(self, priority_function):
         """priorityFunction (item) -> priority"""
         self.priorityFunction = priority_function  # store the priority function
-        PriorityQueue.__init__(self)  # super-class initializer
+        IndexedPriorityQueue.__init__(self)  # super-class initializer
 
     def push(self, item, **kwargs):
         """Adds an item to the queue with priority from the priority function"""
-        PriorityQueue.push(self, item, self.priorityFunction(item))
+        try:
+            indexed = item not in self.index
+        except TypeError:  # unhashable
+            indexed = False
+        self._push_entry(item, self.priorityFunction(item), indexed)
+
+    def update(self, item, **kwargs):
+        """
+        Like IndexedPriorityQueue.update, with the priority from the priority
+        function: keeps the lower priority of an item already queued.
+        """
+        IndexedPriorityQueue.update(self, item, self.priorityFunction(item))
 
 
 def manhattan_distance(xy1, xy2):
@@ -456,6 +616,7 @@ class Counter(dict):
 
 
 def raise_not_defined():
+    import inspect
     file_name = inspect.stack()[1][1]
     line = inspect.stack()[1][2]
     method = inspect.stack()[1][3]
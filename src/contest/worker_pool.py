@@ -0,0 +1,192 @@
+# worker_pool.py
+# --------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Headless games played by a pool of processes forked from a warm parent.
+
+Starting a game from the command line imports the engine and both team
+modules, with whatever they import (numpy, learned weights...), before the
+first move. WarmWorkerPool imports every team once, in the parent, and then
+forks the processes playing the games: they start with the teams already
+loaded, copy-on-write, and only call create_team, fresh for every game.
+By default every game gets its own process, so that the games of a team
+cannot leak state into each other through its module globals, as when
+running them one per command line.
+
+Needs the fork start method (Linux, macOS).
+
+Example, a round robin of three teams on two layouts, 4 games at a time:
+  python worker_pool.py --teams teams/a/my_team.py teams/b/my_team.py baseline_team.py \\
+      --layouts defaultCapture,jumboCapture --processes 4 --db www/contest_default/results.db
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import contest.capture as capture
+import contest.layout
+from contest.text_display import NullGraphics
+
+
+def get_team_name(team_file):
+    """The name of the file, or of its folder for the usual my_team.py"""
+    folder, name = os.path.split(os.path.abspath(team_file))
+    name = os.path.splitext(name)[0]
+    return os.path.basename(folder) if name == 'my_team' else name
+
+
+def load_layout(name):
+    """A layout by name, as with capture.py -l: RANDOM<seed> generates one"""
+    if name.startswith('RANDOM'):
+        layout_name, layout_text = capture.random_layout(int(name[6:]) if name[6:] else None)
+        return contest.layout.REGISTRY.intern(layout_name, layout_text.split('\n'))
+    layout = contest.layout.get_layout(name) or \
+        contest.layout.get_layout(os.path.join(capture.DIR_SCRIPT, 'layouts', name))
+    if layout is None:
+        raise Exception(f"The layout {name} cannot be found")
+    return layout
+
+
+def play_game(red_file, blue_file, layout, length=1200, red_name=None, blue_name=None, red_args=None,
+              blue_args=None, match_id=0, seed=None, catch_exceptions=True, record=False):
+    """
+    Plays a headless game with muted agents; returns a dict with the game as
+    a capture.get_games_data tuple, the seconds spent loading the teams and
+    playing, whether an agent crashed, and the actions when record is set.
+    """
+    red_name = red_name or get_team_name(red_file)
+    blue_name = blue_name or get_team_name(blue_file)
+    if seed is not None:
+        random.seed(seed)  # for the teams drawing from the random module instead of their rng
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        red_agents = capture.load_agents(True, red_file, red_args or {})
+        blue_agents = capture.load_agents(False, blue_file, blue_args or {})
+        load_time = time.time() - start_time
+        if None in red_agents or None in blue_agents:
+            raise Exception(f'The teams of {red_file} and {blue_file} could not be loaded')
+        agents = sum([list(el) for el in zip(red_agents, blue_agents)], [])
+
+        rules = capture.CaptureRules(quiet=True)
+        game = rules.new_game(layout, agents, NullGraphics(), length, True, catch_exceptions, seed)
+        game.run()
+    total_time = time.time() - start_time
+    games_data = capture.get_games_data([game], red_name, blue_name, round(total_time, 0), match_id)
+    return {
+        'game': games_data[0],
+        'load_time': load_time,
+        'time': total_time,
+        'crashed': game.agent_crashed,
+        'actions': game.move_history if record else None,
+    }
+
+
+def _play_game_task(task):
+    return play_game(**task)
+
+
+class WarmWorkerPool:
+    """
+    A multiprocessing pool playing games (see play_game), forked after
+    importing the given team files and computing the data of the given
+    layouts. Use it as a context manager, or close it.
+    games_per_worker > 1 reuses the processes (faster, less isolated).
+    """
+
+    def __init__(self, team_files, processes=None, games_per_worker=1, layouts=()):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for team_file in team_files:
+                for is_red in (True, False):
+                    capture.load_team_module(team_file, is_red)
+        # The workers inherit the layout data too (see LayoutRegistry.warm_up), computed in parallel as
+        # nothing has started a display in this headless parent
+        contest.layout.REGISTRY.warm_up(layouts, processes or multiprocessing.cpu_count())
+        context = multiprocessing.get_context('fork')
+        self.pool = context.Pool(processes, maxtasksperchild=games_per_worker)
+
+    def play_games(self, tasks):
+        """Yields the results of play_game for task dicts of its arguments, as the games end"""
+        return self.pool.imap_unordered(_play_game_task, tasks)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.pool.terminate()
+
+
+def get_round_robin(team_files, layouts, length, seed=None):
+    """
+    The tasks of every pair of teams playing on every layout. Every pair
+    swaps colours from a layout to the next, so that each team is red half
+    of the time (give or take a game with an odd number of layouts).
+    """
+    tasks = []
+    rng = random.Random(seed)
+    pairs = list(itertools.combinations(team_files, 2))
+    for number, ((layout_index, layout), (pair_index, (first, second))) in enumerate(
+            itertools.product(enumerate(layouts), enumerate(pairs))):
+        red, blue = (first, second) if (layout_index + pair_index) % 2 == 0 else (second, first)
+        tasks.append({'red_file': red, 'blue_file': blue, 'layout': layout, 'length': length,
+                      'match_id': number, 'seed': rng.randrange(2 ** 32)})
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plays a round robin with a pool of warm processes')
+    parser.add_argument('--teams', nargs='+', required=True, help='team files')
+    parser.add_argument('--layouts', default='defaultCapture', help='comma separated layouts (default: %(default)s)')
+    parser.add_argument('--length', type=int, default=1200, help='moves per game (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=None, help='games at a time (default: number of CPUs)')
+    parser.add_argument('--games-per-worker', type=int, default=1,
+                        help='games played by a process before it is replaced (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the games')
+    parser.add_argument('--db', help='results store to append the games to (see results.py)')
+    args = parser.parse_args()
+
+    layouts = [load_layout(name) for name in args.layouts.split(',')]
+    tasks = get_round_robin(args.teams, layouts, args.length, args.seed)
+    start_time = time.time()
+    results = []
+    with WarmWorkerPool(args.teams, args.processes, args.games_per_worker, layouts) as pool:
+        for result in pool.play_games(tasks):
+            red, blue, layout_name, score, winner, _, _ = result['game']
+            print(f'{red} vs {blue} on {layout_name}: {winner or "tie"} {score}'
+                  f'{" (crash)" if result["crashed"] else ""}, loaded in {result["load_time"] * 1000:.1f} ms,'
+                  f' played in {result["time"]:.1f} s')
+            results.append(result)
+    print(f'{len(results)} games in {time.time() - start_time:.1f} s', file=sys.stderr)
+
+    if args.db:
+        from contest.results import ResultStore
+        with ResultStore(args.db) as store:
+            store.append_games([result['game'] for result in results], max_steps=args.length)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+
+import contest.capture as capture
+import contest.layout as layout
+from contest.baseline_team import OffensiveReflexAgent, DefensiveReflexAgent
+from contest.features import FeatureSchema
+from contest.text_display import NullGraphics
+from contest.util import Counter
+
+
+class BiasAgent(OffensiveReflexAgent):
+    """Extends the baseline with a feature it does not have, as students do"""
+
+    def get_features(self, game_state, action):
+        features = super().get_features(game_state, action)
+        features['bias'] = 1.0
+        return features
+
+    def get_weights(self, game_state, action):
+        return {'successor_score': 100, 'distance_to_food': -1, 'bias': 2.0}
+
+
+class SchemaBiasAgent(BiasAgent):
+    """The same agent with its features in schema vectors, bias left out of the schema"""
+
+    feature_schema = FeatureSchema(['successor_score', 'distance_to_food'])
+
+    def get_features(self, game_state, action):
+        features = self.feature_schema.new_vector()
+        for name, value in OffensiveReflexAgent.get_features(self, game_state, action).items():
+            features[name] = value
+        features['bias'] = 1.0
+        return features
+
+
+def play(agents, length=60):
+    default = layout.get_layout(os.path.join(capture.DIR_SCRIPT, 'layouts', 'defaultCapture'))
+    game = capture.CaptureRules(quiet=True).new_game(default, agents, NullGraphics(), length, True, False, seed=7)
+    game.run()
+    return game
+
+
+def test_unknown_features_weigh_like_a_counter():
+    schema = FeatureSchema(['a', 'b'])
+    vector, counter = schema.new_vector(), Counter()
+    for features in (vector, counter):
+        features['a'] = 2
+        features['bias'] = 1.0
+    weights = {'a': 3, 'bias': 5, 'unused': 7}
+    assert vector * weights == counter * weights == 11
+    assert schema.evaluate([vector, schema.new_vector()], weights) == [11, 0]
+    assert vector['bias'] == 1.0 and vector['missing'] == 0 and 'bias' in vector
+
+
+def test_subclass_adding_a_feature_plays():
+    for agent_class in (BiasAgent, SchemaBiasAgent):
+        game = play([agent_class(0), DefensiveReflexAgent(1), agent_class(2), DefensiveReflexAgent(3)])
+        assert not game.agent_crashed
+        assert len(game.move_history) == 60
+
+
+def test_schema_vectors_play_the_same_game_as_counters():
+    counters = play([BiasAgent(0), DefensiveReflexAgent(1), BiasAgent(2), DefensiveReflexAgent(3)])
+    vectors = play([SchemaBiasAgent(0), DefensiveReflexAgent(1), SchemaBiasAgent(2), DefensiveReflexAgent(3)])
+    assert counters.move_history == vectors.move_history
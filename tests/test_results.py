@@ -0,0 +1,36 @@
+import json
+
+from contest.results import ResultStore
+
+
+def standings(store):
+    return {row['team']: (row['points'], row['wins'], row['draws'], row['losses'], row['score'])
+            for row in store.get_leaderboard()}
+
+
+def rebuilt_standings(store):
+    store.rebuild_standings()
+    return standings(store)
+
+
+def test_running_a_match_again_replaces_its_games(tmp_path):
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        store.append_games([('a', 'b', 'L', 4, 'a', 1.0, 0), ('a', 'b', 'L', 2, 'a', 1.0, 0),
+                            ('a', 'b', 'M', 0, None, 1.0, 0)])
+        store.append_games([('a', 'b', 'L', 1, 'b', 1.0, 0)])  # the same match, with fewer games on L
+        assert sorted(game[2:5] for game in store.get_results()) == [('L', 1, 'b'), ('M', 0, None)]
+        assert standings(store) == {'a': (1, 0, 1, 1, 0), 'b': (4, 1, 1, 0, 1)}
+        assert standings(store) == rebuilt_standings(store)
+
+
+def test_importing_saved_scores_does_not_count_twice(tmp_path):
+    games = [('a', 'b', 'L', 4, 'a', 2.0, 7), ('a', 'b', 'L', 0, None, 2.0, 7)]
+    scores = tmp_path / 'scores'
+    scores.mkdir()
+    (scores / 'match_7.json').write_text(json.dumps({'games': games, 'max_steps': 1200}))
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        store.append_games(games, max_steps=1200)
+        store.import_scores(str(scores))
+        assert len(list(store.get_results())) == 2
+        assert standings(store) == {'a': (4, 1, 1, 0, 4), 'b': (1, 0, 1, 1, 0)}
+        assert standings(store) == rebuilt_standings(store)
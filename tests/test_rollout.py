@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from contest.game import Actions
+from contest.rollout import RolloutSimulator, initial_state
+
+
+def choose_action(game_state, agent_index, distances, rng):
+    """
+    Mostly heads for the nearest enemy food, and home after eating 3, so
+    that the agents eat, die and return food; a random move otherwise.
+    """
+    legal = game_state.get_legal_actions(agent_index)
+    if rng.random() < 0.2:
+        return rng.choice(legal)
+    agent = game_state.get_agent_state(agent_index)
+    x, y = agent.get_position()
+    food = game_state.get_blue_food() if game_state.is_on_red_team(agent_index) else game_state.get_red_food()
+    targets = (food.as_list() if agent.num_carrying < 3 else []) or [agent.start.get_position()]
+
+    def distance(action):
+        dx, dy = Actions.direction_to_vector(action)
+        return min(distances[((int(x + dx), int(y + dy)), target)] for target in targets)
+    return min(legal, key=distance)
+
+
+def play_side_by_side(layout_name, steps, seed):
+    """
+    Plays games with the engine and the simulator side by side and checks
+    every move; returns the scores seen.
+    """
+    rng = random.Random(seed)
+    game_state = initial_state(layout_name, steps + 1)
+    distances = game_state.data.layout.get_maze_distances()
+    simulator = RolloutSimulator(game_state)
+    state = simulator.from_game_state(game_state)
+    agent_index = 0
+    scores = {state.score}
+    for step in range(steps):
+        legal = game_state.get_legal_actions(agent_index)
+        assert simulator.get_legal_actions(state, agent_index) == legal, f'move {step}'
+        action = choose_action(game_state, agent_index, distances, rng)
+        game_state = game_state.generate_successor(agent_index, action)
+        state = simulator.generate_successor(state, agent_index, action)
+        assert state == simulator.from_game_state(game_state), f'move {step}, agent {agent_index}, {action}'
+        assert simulator.from_game_state(simulator.to_game_state(state, game_state)) == state, f'move {step}'
+        scores.add(state.score)
+        if game_state.is_over():
+            game_state = initial_state(layout_name, steps + 1)
+            state = simulator.from_game_state(game_state)
+            agent_index = 0
+        else:
+            agent_index = (agent_index + 1) % game_state.get_num_agents()
+    return scores
+
+
+@pytest.mark.parametrize('layout_name, seed', [
+    ('defaultCapture', 1),
+    ('defaultCapture', 2),
+    ('alleyCapture', 3),
+    ('tinyCapture', 4),
+    ('RANDOM13', 5),
+    ('RANDOM2317', 6),
+])
+def test_simulator_matches_the_engine(layout_name, seed):
+    scores = play_side_by_side(layout_name, 1500, seed)
+    assert len(scores) > 1  # food was returned or agents were killed
+
+
+def test_rollout_ends_with_the_engine_score():
+    game_state = initial_state('defaultCapture')
+    simulator = RolloutSimulator(game_state)
+    state = simulator.rollout(simulator.from_game_state(game_state), 0, 200, random.Random(7))
+    assert state.timeleft == game_state.data.timeleft - 200
@@ -0,0 +1,33 @@
+import os
+import random
+
+import pytest
+
+import contest.capture as capture
+import contest.layout as layout
+from contest.search import Deadline, MonteCarloTreeSearch, SearchCaptureAgent
+from contest.text_display import NullGraphics
+
+
+def new_game(agents, seed):
+    default = layout.get_layout(os.path.join(capture.DIR_SCRIPT, 'layouts', 'defaultCapture'))
+    return capture.CaptureRules(quiet=True).new_game(default, agents, NullGraphics(), 40, True, False, seed=seed)
+
+
+def test_mcts_draws_from_the_rng_of_the_game():
+    agents = [SearchCaptureAgent(i, search='mcts') for i in range(4)]
+    game = new_game(agents, seed=3)
+    agents[0].register_initial_state(game.state.deep_copy())
+    searcher = agents[0].searcher
+    searcher.search(game.state.deep_copy(), Deadline(seconds=0.01))
+    assert searcher.rng is agents[0].rng
+
+    new_game(agents, seed=4)  # the rules give the agent the stream of the new game
+    searcher.search(game.state.deep_copy(), Deadline(seconds=0.01))
+    assert searcher.rng is agents[0].rng
+
+
+def test_mcts_needs_an_rng_without_an_agent():
+    with pytest.raises(Exception):
+        MonteCarloTreeSearch(0, lambda game_state: 0)
+    assert MonteCarloTreeSearch(0, lambda game_state: 0, rng=random.Random(1)).rng is not None
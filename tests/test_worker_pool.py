@@ -0,0 +1,26 @@
+import collections
+
+from contest.worker_pool import get_round_robin
+
+
+def red_games(tasks):
+    return collections.Counter(task['red_file'] for task in tasks)
+
+
+def test_round_robin_colours_are_balanced():
+    teams = ['a', 'b', 'c', 'd']
+    tasks = get_round_robin(teams, ['layout1', 'layout2'], 100, seed=1)
+    assert len(tasks) == 12
+    assert red_games(tasks) == {team: 3 for team in teams}
+    for first, second in [('a', 'b'), ('a', 'c'), ('b', 'd')]:
+        games = [task for task in tasks if {task['red_file'], task['blue_file']} == {first, second}]
+        assert {task['red_file'] for task in games} == {first, second}
+
+
+def test_round_robin_odd_layouts_are_nearly_balanced():
+    teams = ['a', 'b', 'c', 'd', 'e']
+    tasks = get_round_robin(teams, ['layout1', 'layout2', 'layout3'], 100)
+    games = collections.Counter(task['red_file'] for task in tasks) + \
+        collections.Counter(task['blue_file'] for task in tasks)
+    for team, red in red_games(tasks).items():
+        assert abs(2 * red - games[team]) <= 2